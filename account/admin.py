@@ -1,6 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import User, Signature, SignatureEmbedding
+
+
+class SignatureInline(admin.StackedInline):
+    model = Signature
+    fields = ('content_type', 'sha256', 'created_at', 'updated_at')
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -11,7 +20,7 @@ class UserAdmin(BaseUserAdmin):
     ordering = ('email',)
 
     fieldsets = (
-        (None, {'fields': ('email', 'phone', 'name', 'signaturebase64', 'signaturejson')}),
+        (None, {'fields': ('email', 'phone', 'name')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'can_create_organizations')}),
         ('Important dates', {'fields': ('date_joined',)}),
         ('Logs', {'fields': ('last_seen', 'banned_by', 'unbanned_by', 'banned_at', 'unbanned_at', 'granted_organizational_permission_by', 'revoked_organizational_permission_by', 'granted_organizational_permission_at', 'revoked_organizational_permission_at', 'granted_staff_status_by', 'revoked_staff_status_by', 'granted_staff_status_at', 'revoked_staff_status_at')}),
@@ -19,7 +28,10 @@ class UserAdmin(BaseUserAdmin):
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
-            'fields': ('email', 'phone', 'signaturebase64', 'signaturejson', 'is_active', 'is_staff', 'is_superuser', 'can_create_organizations'),
+            'fields': ('email', 'phone', 'is_active', 'is_staff', 'is_superuser', 'can_create_organizations'),
         }),
     )
     readonly_fields = ('date_joined',)
+    inlines = [SignatureInline]
+
+admin.site.register(SignatureEmbedding)
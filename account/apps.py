@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AccountConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "account"
+
+    def ready(self):
+        # Opt-in: load the signature model while the worker boots instead of
+        # on the first verification request. With a verification pool the
+        # pool's workers hold the model and warm it up themselves, and this
+        # process (the pool server included) has to boot while the pool is down.
+        if settings.SIGNATURE_MODEL_WARMUP and not settings.SIGNATURE_POOL_ADDRESS:
+            from .utils import warmup_signature_model
+            warmup_signature_model()
@@ -0,0 +1,68 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import SignatureEmbedding
+from .preprocessing import InvalidSignature, prepare_signature_bytes
+
+
+def init_worker():
+    # Spawned interpreters start without Django configured.
+    import django
+    django.setup()
+
+
+def embed_images(items):
+    """
+    Preprocess and embed a batch of (user_id, image bytes) in one forward
+    pass. Returns (user ids, embedding rows, {user_id: error}). Runs in the
+    backfill process or in a pool worker.
+    """
+    from .utils import embed_batch_locally
+
+    ids, tensors, failures = [], [], {}
+    for user_id, data in items:
+        try:
+            tensors.append(prepare_signature_bytes(data).tensor)
+            ids.append(user_id)
+        except InvalidSignature as e:
+            failures[user_id] = str(e)
+    if not tensors:
+        return ids, np.empty((0, 0), dtype=np.float32), failures
+    return ids, embed_batch_locally(np.stack(tensors)), failures
+
+
+def write_enrolled_embeddings(ids, embeddings, hashes, version):
+    """Upsert enrolled templates for a batch with one bulk_update and one bulk_create, in one transaction."""
+    dtype = settings.SIGNATURE_EMBEDDING_DTYPE
+    now = timezone.now()
+    existing = {
+        row.user_id: row
+        for row in SignatureEmbedding.objects.filter(source=SignatureEmbedding.ENROLLED, user_id__in=ids)
+        .only('id', 'user_id')
+    }
+    updated, created = [], []
+    for user_id, embedding in zip(ids, embeddings):
+        values = {
+            'model_version': version,
+            'signature_hash': hashes[user_id],
+            'dtype': dtype,
+            'vector': embedding.astype(dtype).tobytes(),
+        }
+        row = existing.get(user_id)
+        if row is None:
+            created.append(SignatureEmbedding(user_id=user_id, source=SignatureEmbedding.ENROLLED, **values))
+        else:
+            for field, value in values.items():
+                setattr(row, field, value)
+            # bulk_update skips auto_now
+            row.updated_at = now
+            updated.append(row)
+    with transaction.atomic():
+        if updated:
+            SignatureEmbedding.objects.bulk_update(
+                updated, ['model_version', 'signature_hash', 'dtype', 'vector', 'updated_at']
+            )
+        if created:
+            SignatureEmbedding.objects.bulk_create(created)
+    return len(updated) + len(created)
@@ -0,0 +1,72 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Collects single inputs submitted from concurrent request threads and runs
+    them through `batch_fn` together. A batch is flushed as soon as it holds
+    `max_batch_size` items or the oldest item has waited `max_wait_ms`.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def submit(self, item):
+        """Queue one input and return a Future resolving to its row of the batch output."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def run(self, item, timeout=None):
+        return self.submit(item).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        # Threads don't survive fork, so a pre-forked worker needs its own.
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != pid or not self._worker.is_alive():
+                if self._worker_pid != pid:
+                    self._queue = queue.Queue()
+                self._worker_pid = pid
+                self._worker = threading.Thread(target=self._loop, name="signature-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            futures = [future for _, future in batch]
+            try:
+                outputs = self.batch_fn(np.stack([item for item, _ in batch]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
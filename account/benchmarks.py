@@ -0,0 +1,102 @@
+import base64
+import io
+import os
+import time
+import numpy as np
+from PIL import Image, ImageDraw
+from .preprocessing import prepare_signature
+
+# (width, height) of generated canvases: phone, tablet and scanned-page sizes.
+SYNTHETIC_SIZES = [(400, 200), (1200, 600), (3000, 1500)]
+SYNTHETIC_FORMATS = ['PNG', 'JPEG', 'WEBP']
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def synthetic_signature(rng, size, image_format):
+    """A data URL with a few random pen strokes, transparent where the format allows it."""
+    width, height = size
+    transparent = image_format in ('PNG', 'WEBP')
+    img = Image.new('RGBA' if transparent else 'RGB', size, (255, 255, 255, 0) if transparent else 'white')
+    draw = ImageDraw.Draw(img)
+    pen = max(2, width // 150)
+    for _ in range(rng.integers(2, 5)):
+        t = np.linspace(0, 1, 60)
+        x = width * (0.1 + 0.8 * t)
+        y = height * (0.5 + 0.3 * np.sin(t * rng.uniform(4, 12) + rng.uniform(0, np.pi)) * rng.uniform(0.3, 1))
+        draw.line(list(zip(x, y)), fill=(0, 0, 0, 255) if transparent else 'black', width=pen, joint='curve')
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format)
+    return f"data:image/{image_format.lower()};base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def synthetic_signatures(count, sizes=None, formats=None, seed=0):
+    """`count` signatures for every size/format pair, as {(size, format): [data URL, ...]}."""
+    rng = np.random.default_rng(seed)
+    Image.init()
+    formats = [f for f in (formats or SYNTHETIC_FORMATS) if f in Image.SAVE]
+    return {
+        (size, image_format): [synthetic_signature(rng, size, image_format) for _ in range(count)]
+        for size in (sizes or SYNTHETIC_SIZES)
+        for image_format in formats
+    }
+
+
+def summarize(samples_ms, items_per_call=1):
+    """Latency percentiles (ms) and images per second per core of repeated calls."""
+    samples = np.asarray(samples_ms)
+    mean = float(samples.mean())
+    return {
+        'calls': len(samples),
+        'mean_ms': mean,
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'images_per_second_per_core': items_per_call * 1000 / mean / available_cores() if mean else 0.0,
+    }
+
+
+def time_calls(fn, iterations, warmup=0):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def preprocessing_samples(signatures):
+    """Per-image decode (base64 + image) and preprocess (crop + resize) durations in ms."""
+    decode, preprocess = [], []
+    for signature in signatures:
+        timings = prepare_signature(signature).timings
+        decode.append((timings['base64'] + timings['decode']) * 1000)
+        preprocess.append((timings['crop'] + timings['resize']) * 1000)
+    return decode, preprocess
+
+
+def thread_benchmark_worker(index, environment, backend, batch_size, iterations, ready, start, results):
+    """
+    One spawned worker of benchmark_signature_threads. Settings come from
+    `environment`, so it is applied before Django and TensorFlow start.
+    """
+    os.environ.update(environment)
+    os.environ['SIGNATURE_WORKER_INDEX'] = str(index)
+    import django
+    django.setup()
+    from .embedding_backends import get_embedding_backend
+
+    engine = get_embedding_backend(backend)
+    batch = np.random.default_rng(index).uniform(-1, 1, (batch_size, 224, 224, 3)).astype(np.float32)
+    engine.embed(batch)
+    ready.put(index)
+    start.wait()
+    samples = time_calls(lambda: engine.embed(batch), iterations)
+    results.put((index, samples, time.time()))
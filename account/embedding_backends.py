@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+import numpy as np
+from django.conf import settings
+from . import model_registry
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_MODEL = "mobilenetv2"
+SIGNATURE_FUNCTION = "mobilenetv2-function"
+TF_RUNTIME = "tensorflow-runtime"
+INFERENCE_MODES = ['predict', 'call', 'function']
+TFLITE_QUANTIZATIONS = ['float16', 'int8']
+
+
+def worker_cpus(index, threads, cpus):
+    """The block of `threads` CPUs worker `index` is pinned to, wrapping around `cpus`."""
+    cpus = sorted(cpus)
+    return {cpus[(index * threads + offset) % len(cpus)] for offset in range(threads)}
+
+
+def _configure_runtime():
+    """
+    Size TensorFlow's thread pools from settings and, if SIGNATURE_CPU_PINNING
+    is on and this process has a SIGNATURE_WORKER_INDEX, pin it to its own
+    block of cores. Must run before TensorFlow creates its pools.
+    """
+    import tensorflow as tf
+    intra = settings.SIGNATURE_TF_INTRA_OP_THREADS
+    inter = settings.SIGNATURE_TF_INTER_OP_THREADS
+    cpus = None
+    index = os.environ.get('SIGNATURE_WORKER_INDEX')
+    if settings.SIGNATURE_CPU_PINNING and index is not None and hasattr(os, 'sched_setaffinity'):
+        cpus = worker_cpus(int(index), intra, os.sched_getaffinity(0))
+        os.sched_setaffinity(0, cpus)
+    try:
+        if intra:
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+        if inter:
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+    except RuntimeError as e:
+        logger.warning("TensorFlow was initialised before its thread pools could be configured: %s", e)
+    return {'intra_op_threads': intra, 'inter_op_threads': inter, 'cpus': sorted(cpus) if cpus else None}
+
+
+def _load_signature_model():
+    import tensorflow as tf
+    model_registry.get(TF_RUNTIME)
+    return tf.keras.applications.MobileNetV2(weights="imagenet", include_top=False)
+
+
+def _load_signature_function():
+    import tensorflow as tf
+    model = get_signature_model()
+
+    # A fixed signature means one trace serves every batch size.
+    @tf.function(input_signature=[tf.TensorSpec(shape=[None, 224, 224, 3], dtype=tf.float32)])
+    def infer(batch):
+        return model(batch, training=False)
+
+    return infer
+
+
+model_registry.register(TF_RUNTIME, _configure_runtime)
+model_registry.register(SIGNATURE_MODEL, _load_signature_model)
+model_registry.register(SIGNATURE_FUNCTION, _load_signature_function)
+
+
+def get_signature_model():
+    """Return the shared MobileNetV2 instance, loading TensorFlow on first use."""
+    return model_registry.get(SIGNATURE_MODEL)
+
+
+class EmbeddingBackend:
+    """Turns a preprocessed (n, 224, 224, 3) float32 batch into (n, 7, 7, 1280) float32 feature maps."""
+    name = None
+    # Identifies the weights/numerics; embeddings from different versions are not comparable.
+    version = None
+
+    def embed(self, batch):
+        raise NotImplementedError
+
+
+class KerasBackend(EmbeddingBackend):
+    name = 'keras'
+    version = 'mobilenetv2-imagenet'
+
+    def __init__(self, mode=None):
+        self.mode = mode or settings.SIGNATURE_INFERENCE_MODE
+        if self.mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown signature inference mode: {self.mode}")
+
+    def embed(self, batch):
+        if self.mode == 'predict':
+            # Builds a data adapter and callback loop per call; kept for comparison.
+            embeddings = get_signature_model().predict(batch, verbose=0)
+        elif self.mode == 'call':
+            embeddings = get_signature_model()(batch, training=False).numpy()
+        else:
+            embeddings = model_registry.get(SIGNATURE_FUNCTION)(batch).numpy()
+        return embeddings.astype(np.float32)
+
+
+class TFLiteBackend(EmbeddingBackend):
+    """Runs a MobileNetV2 converted by the convert_signature_models command."""
+    quantization = None
+
+    def __init__(self):
+        self.path = tflite_model_path(self.quantization)
+        self._interpreter = None
+        self._batch_size = None
+        # An interpreter holds its tensors in place, so calls must not overlap.
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(
+                f"{self.path} does not exist. Run `python manage.py convert_signature_models` first."
+            )
+        import tensorflow as tf
+        model_registry.get(TF_RUNTIME)
+        self._interpreter = tf.lite.Interpreter(
+            model_path=str(self.path), num_threads=settings.SIGNATURE_TF_INTRA_OP_THREADS or None
+        )
+        self._input = self._interpreter.get_input_details()[0]['index']
+        self._output = self._interpreter.get_output_details()[0]['index']
+
+    def embed(self, batch):
+        with self._lock:
+            if self._interpreter is None:
+                self._load()
+            if self._batch_size != len(batch):
+                self._interpreter.resize_tensor_input(self._input, [len(batch), 224, 224, 3])
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self._interpreter.set_tensor(self._input, batch)
+            self._interpreter.invoke()
+            embeddings = self._interpreter.get_tensor(self._output)
+        return embeddings.astype(np.float32)
+
+
+class TFLiteFloat16Backend(TFLiteBackend):
+    name = 'tflite_float16'
+    version = 'mobilenetv2-imagenet-tflite-float16'
+    quantization = 'float16'
+
+
+class TFLiteInt8Backend(TFLiteBackend):
+    name = 'tflite_int8'
+    version = 'mobilenetv2-imagenet-tflite-int8'
+    quantization = 'int8'
+
+
+EMBEDDING_BACKENDS = {
+    backend.name: backend
+    for backend in [KerasBackend, TFLiteFloat16Backend, TFLiteInt8Backend]
+}
+
+for _name, _backend in EMBEDDING_BACKENDS.items():
+    model_registry.register(f'backend:{_name}', _backend)
+
+
+def get_embedding_backend(name=None):
+    """Return the shared instance of the named (default: configured) backend."""
+    return model_registry.get(f'backend:{name or settings.SIGNATURE_EMBEDDING_BACKEND}')
+
+
+def tflite_model_path(quantization):
+    return os.path.join(settings.SIGNATURE_MODEL_DIR, f'mobilenetv2_{quantization}.tflite')
+
+
+def convert_to_tflite(quantization, representative_batches=None):
+    """
+    Convert the Keras model to TFLite and return the serialized flatbuffer.
+    int8 quantizes weights and activations and needs `representative_batches`,
+    a list of preprocessed (1, 224, 224, 3) arrays used for calibration.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(get_signature_model())
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_batches is None:
+            raise ValueError("int8 quantization needs representative batches for calibration.")
+        converter.representative_dataset = lambda: ([batch] for batch in representative_batches)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Unknown TFLite quantization: {quantization}")
+    return converter.convert()
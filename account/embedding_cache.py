@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+from . import verification_stats
+
+CACHE_COUNTERS = ['cache_hit', 'cache_miss', 'cache_evict', 'cache_expire']
+
+
+class EmbeddingCache:
+    """
+    Bounded in-process LRU of probe embeddings with a time-to-live, so clients
+    retrying the same payload don't pay for another forward pass.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        expired = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                expired = True
+                entry = None
+            elif entry is not None:
+                self._entries.move_to_end(key)
+        if expired:
+            verification_stats.record('cache_expire')
+        verification_stats.record('cache_miss' if entry is None else 'cache_hit')
+        return None if entry is None else entry[1]
+
+    def set(self, key, embedding):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            verification_stats.record('cache_evict', evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
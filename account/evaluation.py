@@ -0,0 +1,125 @@
+import base64
+import io
+import numpy as np
+from .models import Signature
+from .stroke_matching import stroke_distance
+from .utils import decode_base64_to_image, preprocess_signature
+
+
+def enrolled_signatures(limit):
+    return [signature.data_url() for signature in Signature.objects.with_image().order_by('created_at')[:limit]]
+
+
+def perturb_signature(base64_string, angle):
+    """Re-encode a signature slightly rotated, as a stand-in for a second genuine sample."""
+    img = decode_base64_to_image(base64_string).rotate(angle, fillcolor=(255, 255, 255))
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def build_pairs(signatures, angle):
+    """
+    Preprocessed reference, genuine and impostor batches. Only one sample per
+    user is enrolled, so genuine probes are rotated copies and impostors are
+    the next user's signature.
+    """
+    references = np.stack([preprocess_signature(s) for s in signatures])
+    genuine = np.stack([preprocess_signature(perturb_signature(s, angle)) for s in signatures])
+    impostor = np.roll(references, -1, axis=0)
+    return references, genuine, impostor
+
+
+def cosine_rows(a, b):
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return np.sum(a * b, axis=1) / np.maximum(norms, 1e-12)
+
+
+def synthetic_strokes(rng):
+    """A made-up cursive signature in the client's stroke JSON: one to three looping strokes, left to right."""
+    strokes = []
+    left = 0.0
+    for _ in range(rng.integers(1, 4)):
+        t = np.linspace(0, 1, int(rng.integers(30, 90)))
+        frequencies = rng.uniform(4, 14, 3)
+        phases = rng.uniform(0, 2 * np.pi, 3)
+        radii = rng.uniform(5, 25, 3)
+        width = rng.uniform(60, 160)
+        loops = [radii[k] * np.exp(1j * (frequencies[k] * 2 * np.pi * t / 3 + phases[k])) for k in range(3)]
+        x = left + width * t + sum(loop.real for loop in loops)
+        y = sum(loop.imag for loop in loops) * rng.uniform(0.8, 1.6)
+        strokes.append([{'x': float(a), 'y': float(b)} for a, b in zip(x, y)])
+        left += width + rng.uniform(5, 30)
+    return strokes
+
+
+def redraw_strokes(strokes, rng, amount=1.0):
+    """
+    The same signature drawn again: slightly rotated, scaled and sheared,
+    with smooth wobble, jitter and a different pen speed. `amount` scales
+    every distortion; about 3 mimics a careful forger copying the shape.
+    """
+    angle = np.deg2rad(rng.normal(0, 3 * amount))
+    scale = rng.normal(1, 0.05 * amount, 2)
+    shear = rng.normal(0, 0.05 * amount)
+    transform = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]) @ np.array(
+        [[scale[0], shear], [0, scale[1]]]
+    )
+    arrays = [np.array([(point['x'], point['y']) for point in stroke], dtype=np.float64) for stroke in strokes]
+    size = np.ptp(np.concatenate(arrays), axis=0).max()
+    redrawn = []
+    for points in arrays:
+        n = len(points)
+        t = np.linspace(0, 1, n)
+        warped = np.clip(t + 0.05 * amount * np.sin(np.pi * t) * rng.normal(), 0, 1)
+        points = np.column_stack([np.interp(warped, t, points[:, 0]), np.interp(warped, t, points[:, 1])])
+        k = np.arange(n)[:, None]
+        points = points + sum(
+            rng.normal(0, 0.02 * amount * size, 2) * np.sin(np.pi * f * k / n + rng.uniform(0, 2 * np.pi))
+            for f in (1, 2, 3)
+        ) + rng.normal(0, 0.004 * amount * size, (n, 2))
+        samples = np.linspace(0, n - 1, max(2, int(n * rng.uniform(0.8, 1.25))))
+        points = np.column_stack([np.interp(samples, np.arange(n), points[:, 0]), np.interp(samples, np.arange(n), points[:, 1])])
+        redrawn.append([{'x': float(x), 'y': float(y)} for x, y in points @ transform.T])
+    return redrawn
+
+
+def degenerate_strokes():
+    """Probes that aren't signatures at all: straight lines, a tick and a zigzag."""
+    def stroke(xs, ys):
+        return [{'x': float(x), 'y': float(y)} for x, y in zip(xs, ys)]
+    line = np.linspace(0, 200, 40)
+    zigzag = np.arange(40)
+    return {
+        'flat_line': [stroke(line, np.zeros(40))],
+        'vertical_line': [stroke(np.zeros(40), line)],
+        'tick': [stroke([0, 10, 40], [0, 10, -30])],
+        'zigzag': [stroke(zigzag * 5, (zigzag % 2) * 30)],
+    }
+
+
+def stroke_pair_distances(signatures, rng, redraws=3, skilled_amount=3.0):
+    """
+    DTW distances of genuine and forged stroke pairs per kind. Genuine probes
+    are redrawn copies of each signature; forgeries are other users'
+    signatures, careful copies (redrawn with `skilled_amount` distortion) and
+    degenerate scribbles.
+    """
+    others = signatures[1:] + signatures[:1]
+    distances = {
+        'genuine': [stroke_distance(s, redraw_strokes(s, rng)) for s in signatures for _ in range(redraws)],
+        'random_forgery': [stroke_distance(s, other) for s, other in zip(signatures, others)],
+        'skilled_forgery': [stroke_distance(s, redraw_strokes(s, rng, skilled_amount)) for s in signatures],
+        'degenerate': [stroke_distance(s, probe) for s in signatures for probe in degenerate_strokes().values()],
+    }
+    return {kind: np.array([d for d in values if d is not None]) for kind, values in distances.items()}
+
+
+def stroke_bounds(genuine, forged, margin=0.8):
+    """
+    Cascade bounds from pair distances: the closest forgery's distance times
+    `margin` to accept below, so no forgery would be, and the furthest
+    genuine pair's distance divided by `margin` to reject above, so no
+    genuine pair would be. Returns (accept, reject).
+    """
+    return float(forged.min() * margin), float(genuine.max() / margin)
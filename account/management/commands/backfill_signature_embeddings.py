@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from account.backfill import embed_images, init_worker, write_enrolled_embeddings
+from account.models import Signature, SignatureEmbedding
+from account.utils import signature_model_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute and store enrolled signature embeddings for every user that is missing one or has a stale "
+        "one, in large batches and optionally across worker processes. Interrupted runs pick up where they "
+        "stopped; use --checkpoint to resume an interrupted --force run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Recompute embeddings even if they are current.")
+        parser.add_argument('--batch-size', type=int, default=64, help="Images per forward pass.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows fetched from the database at a time.")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Worker processes, each loading its own model. 0 embeds in this process.")
+        parser.add_argument('--checkpoint', help=(
+            "File recording the last signature whose batch was stored, read back on restart and removed once "
+            "a run completes."
+        ))
+
+    def signatures(self, force, version, after):
+        signatures = Signature.objects.with_image().order_by('pk')
+        if not force:
+            current = SignatureEmbedding.objects.filter(
+                user_id=OuterRef('user_id'),
+                source=SignatureEmbedding.ENROLLED,
+                model_version=version,
+                signature_hash=OuterRef('sha256'),
+            )
+            signatures = signatures.exclude(Exists(current))
+        if after:
+            signatures = signatures.filter(pk__gt=after)
+        return signatures.values_list('pk', 'user_id', 'image', 'sha256')
+
+    def batches(self, rows, batch_size):
+        """Yield (items, {user_id: sha256}, pk of the batch's last signature)."""
+        batch, hashes = [], {}
+        for pk, user_id, image, sha256 in rows:
+            batch.append((user_id, bytes(image)))
+            hashes[user_id] = sha256
+            if len(batch) == batch_size:
+                yield batch, hashes, pk
+                batch, hashes = [], {}
+        if batch:
+            yield batch, hashes, pk
+
+    def embedded(self, batches, workers):
+        """Yield (hashes, last pk, result) per batch in order, keeping at most two batches per worker in flight."""
+        if not workers:
+            for batch, hashes, last in batches:
+                yield hashes, last, embed_images(batch)
+            return
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+        in_flight = deque()
+        try:
+            for batch, hashes, last in batches:
+                in_flight.append((hashes, last, pool.submit(embed_images, batch)))
+                if len(in_flight) >= workers * 2:
+                    hashes, last, future = in_flight.popleft()
+                    yield hashes, last, future.result()
+            while in_flight:
+                hashes, last, future = in_flight.popleft()
+                yield hashes, last, future.result()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['chunk_size'] < 1 or options['workers'] < 0:
+            raise CommandError("--batch-size and --chunk-size must be positive and --workers non-negative.")
+        version = signature_model_version()
+        checkpoint = options['checkpoint']
+        after = None
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                after = f.read().strip() or None
+            if after:
+                self.stdout.write(f"Resuming after signature {after}.")
+
+        rows = self.signatures(options['force'], version, after).iterator(chunk_size=options['chunk_size'])
+        stored = failed = 0
+        started = time.perf_counter()
+        for hashes, last, (ids, embeddings, failures) in self.embedded(
+            self.batches(rows, options['batch_size']), options['workers']
+        ):
+            if ids:
+                stored += write_enrolled_embeddings(ids, embeddings, hashes, version)
+            for user_id, error in failures.items():
+                failed += 1
+                self.stderr.write(f"Failed to embed signature of user {user_id}: {error}")
+            if checkpoint:
+                # Only now that the batch is committed.
+                with open(checkpoint, 'w') as f:
+                    f.write(str(last))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{stored} stored, {failed} failed, {(stored + failed) / elapsed:.1f} images/s")
+
+        if checkpoint and os.path.exists(checkpoint):
+            # A finished pass leaves nothing to resume; a later run must start from the beginning.
+            os.remove(checkpoint)
+        elapsed = time.perf_counter() - started
+        rate = (stored + failed) / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} signature embeddings ({failed} failed) in {elapsed:.1f}s, {rate:.1f} images/s."
+        ))
@@ -0,0 +1,29 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from account.benchmarks import summarize, time_calls
+from account.embedding_backends import INFERENCE_MODES, KerasBackend
+
+
+class Command(BaseCommand):
+    help = "Compare per-call latency of the Keras inference modes (predict, call, function)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=INFERENCE_MODES, default=INFERENCE_MODES)
+        parser.add_argument('--batch-size', type=int, default=1)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed calls per mode before measuring.")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        batch = rng.uniform(-1, 1, size=(options['batch_size'], 224, 224, 3)).astype(np.float32)
+
+        self.stdout.write(f"batch_size={options['batch_size']} iterations={options['iterations']}")
+        self.stdout.write(f"{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'img/s/core':>12}")
+        for mode in options['modes']:
+            backend = KerasBackend(mode=mode)
+            samples = time_calls(lambda: backend.embed(batch), options['iterations'], options['warmup'])
+            row = summarize(samples, options['batch_size'])
+            self.stdout.write(
+                f"{mode:<10}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+                f"{row['images_per_second_per_core']:>12.1f}"
+            )
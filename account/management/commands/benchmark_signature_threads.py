@@ -0,0 +1,93 @@
+import json
+import multiprocessing
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from account.benchmarks import available_cores, summarize, thread_benchmark_worker
+from account.embedding_backends import EMBEDDING_BACKENDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent signature workers under different workers x threads splits of this host and "
+        "report throughput and tail latency, to pick SIGNATURE_POOL_WORKERS / SIGNATURE_TF_INTRA_OP_THREADS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--splits', nargs='+',
+                            help="WORKERSxTHREADS pairs, e.g. 1x8 2x4 4x2. Default: every split using all cores.")
+        parser.add_argument('--backend', choices=list(EMBEDDING_BACKENDS), default=settings.SIGNATURE_EMBEDDING_BACKEND)
+        parser.add_argument('--batch-size', type=int, default=1)
+        parser.add_argument('--iterations', type=int, default=30, help="Timed calls per worker.")
+        parser.add_argument('--pin', action='store_true', help="Pin each worker to its own cores.")
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def _splits(self, options):
+        if not options['splits']:
+            cores = available_cores()
+            return sorted({(workers, cores // workers) for workers in range(1, cores + 1)})
+        try:
+            return [tuple(int(n) for n in split.lower().split('x')) for split in options['splits']]
+        except ValueError:
+            raise CommandError("Splits look like 2x4 (workers x threads).")
+
+    def _run(self, workers, threads, options):
+        context = multiprocessing.get_context('spawn')
+        ready, results, start = context.Queue(), context.Queue(), context.Event()
+        environment = {
+            'SIGNATURE_TF_INTRA_OP_THREADS': str(threads),
+            'SIGNATURE_TF_INTER_OP_THREADS': '1',
+            'SIGNATURE_CPU_PINNING': 'true' if options['pin'] else 'false',
+            'SIGNATURE_MODEL_WARMUP': 'false',
+        }
+        processes = [
+            context.Process(target=thread_benchmark_worker, args=(
+                index, environment, options['backend'], options['batch_size'], options['iterations'],
+                ready, start, results,
+            ), daemon=True)
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.get()
+        began = time.time()
+        start.set()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        samples = np.concatenate([samples for _, samples, _ in outcomes])
+        elapsed = max(finished for _, _, finished in outcomes) - began
+        latency = summarize(samples, options['batch_size'])
+        return {
+            'workers': workers,
+            'threads': threads,
+            'pinned': options['pin'],
+            'images_per_second': len(samples) * options['batch_size'] / elapsed,
+            'p50_ms': latency['p50_ms'],
+            'p95_ms': latency['p95_ms'],
+            'p99_ms': latency['p99_ms'],
+        }
+
+    def handle(self, *args, **options):
+        rows = []
+        self.stdout.write(f"{'split':<10}{'img/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for workers, threads in self._splits(options):
+            row = self._run(workers, threads, options)
+            rows.append(row)
+            self.stdout.write(
+                f"{f'{workers}x{threads}':<10}{row['images_per_second']:>10.1f}{row['p50_ms']:>10.2f}"
+                f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+            )
+
+        best = max(rows, key=lambda row: row['images_per_second'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Highest throughput: SIGNATURE_POOL_WORKERS={best['workers']} "
+            f"SIGNATURE_TF_INTRA_OP_THREADS={best['threads']} ({best['images_per_second']:.1f} img/s, "
+            f"p99 {best['p99_ms']:.1f} ms)"
+        ))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'cores': available_cores(), 'backend': options['backend'], 'results': rows}, f, indent=2)
@@ -0,0 +1,108 @@
+import json
+import os
+import platform
+import subprocess
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from account.benchmarks import (
+    available_cores, preprocessing_samples, summarize, synthetic_signatures, time_calls
+)
+from account.embedding_backends import EMBEDDING_BACKENDS, TFLiteBackend, get_embedding_backend
+from account.preprocessing import prepare_signature
+from account.utils import project_features
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark signature verification on synthetic images: decode and preprocess per size/format, "
+        "inference per backend and batch size, and template similarity. Writes JSON for comparing commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', choices=list(EMBEDDING_BACKENDS),
+                            help="Default: keras plus every TFLite backend whose model file exists.")
+        parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+        parser.add_argument('--images', type=int, default=10, help="Synthetic images per size and format.")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', help="Write the results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        backends = options['backends'] or [
+            name for name, backend in EMBEDDING_BACKENDS.items()
+            if not issubclass(backend, TFLiteBackend) or os.path.exists(backend().path)
+        ]
+        signatures = synthetic_signatures(options['images'])
+        results = {
+            'commit': _commit(),
+            'created_at': timezone.now().isoformat(),
+            'machine': {'platform': platform.platform(), 'cores': available_cores()},
+            'settings': {
+                'embedding_mode': settings.SIGNATURE_EMBEDDING_MODE,
+                'embedding_dtype': settings.SIGNATURE_EMBEDDING_DTYPE,
+                'inference_mode': settings.SIGNATURE_INFERENCE_MODE,
+                'max_templates': settings.SIGNATURE_MAX_TEMPLATES,
+            },
+            'preprocessing': [],
+            'inference': [],
+            'similarity': [],
+        }
+
+        self.stdout.write(f"{'stage':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'img/s/core':>12}")
+        for (size, image_format), images in signatures.items():
+            decode, preprocess = preprocessing_samples(images)
+            for stage, samples in [('decode', decode), ('preprocess', preprocess)]:
+                row = {'stage': stage, 'size': list(size), 'format': image_format, **summarize(samples)}
+                results['preprocessing'].append(row)
+                self._row(f"{stage} {size[0]}x{size[1]} {image_format}", row)
+
+        tensors = [prepare_signature(s).tensor for images in signatures.values() for s in images]
+        embedding = None
+        for name in backends:
+            backend = get_embedding_backend(name)
+            for batch_size in options['batch_sizes']:
+                batch = np.stack([tensors[i % len(tensors)] for i in range(batch_size)])
+                samples = time_calls(
+                    lambda: project_features(backend.embed(batch)), options['iterations'], options['warmup']
+                )
+                row = {'backend': name, 'batch_size': batch_size, **summarize(samples, batch_size)}
+                results['inference'].append(row)
+                self._row(f"inference {name} batch={batch_size}", row)
+            if embedding is None:
+                embedding = project_features(backend.embed(batch[:1]))[0]
+
+        if embedding is not None:
+            rng = np.random.default_rng(0)
+            for templates in sorted({1, settings.SIGNATURE_MAX_TEMPLATES}):
+                matrix = rng.standard_normal((templates, embedding.size)).astype(np.float32)
+                matrix = matrix.astype(settings.SIGNATURE_EMBEDDING_DTYPE).astype(np.float32)
+                samples = time_calls(
+                    lambda: (matrix @ embedding) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding)),
+                    options['iterations'] * 10,
+                )
+                row = {'templates': templates, 'dimensions': int(embedding.size), **summarize(samples)}
+                results['similarity'].append(row)
+                self._row(f"similarity templates={templates}", row)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def _row(self, label, row):
+        self.stdout.write(
+            f"{label:<34}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+            f"{row['images_per_second_per_core']:>12.1f}"
+        )
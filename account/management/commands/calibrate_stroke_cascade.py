@@ -0,0 +1,79 @@
+import json
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from account.evaluation import stroke_bounds, stroke_pair_distances, synthetic_strokes
+from account.models import Signature
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure stroke DTW distances of genuine and forged signature pairs and recommend "
+        "SIGNATURE_STROKE_ACCEPT_DISTANCE and SIGNATURE_STROKE_REJECT_DISTANCE. Uses enrolled stroke data, "
+        "or generated signatures with --synthetic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help="Enrolled signatures with strokes to sample.")
+        parser.add_argument('--synthetic', type=int, default=0, help="Generate this many signatures instead.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--redraws', type=int, default=3, help="Genuine probes per signature.")
+        parser.add_argument('--skilled-amount', type=float, default=3.0,
+                            help="Distortion of the careful copies used as skilled forgeries.")
+        parser.add_argument('--margin', type=float, default=0.8, help="Safety factor applied to both bounds.")
+        parser.add_argument('--output', help="Write the run as JSON to this path.")
+
+    def handle(self, *args, **options):
+        if not 0 < options['margin'] <= 1:
+            raise CommandError("--margin must be in (0, 1].")
+        rng = np.random.default_rng(options['seed'])
+        if options['synthetic']:
+            signatures = [synthetic_strokes(rng) for _ in range(options['synthetic'])]
+        else:
+            enrolled = Signature.objects.with_strokes().exclude(strokes=None).order_by('created_at')
+            signatures = [s.stroke_data() for s in enrolled[:options['limit']]]
+        if len(signatures) < 2:
+            raise CommandError("At least two signatures with stroke data are needed.")
+
+        distances = stroke_pair_distances(signatures, rng, options['redraws'], options['skilled_amount'])
+        genuine = distances['genuine']
+        forged = np.concatenate([values for kind, values in distances.items() if kind != 'genuine'])
+        accept, reject = stroke_bounds(genuine, forged, options['margin'])
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'source': 'synthetic' if options['synthetic'] else 'enrolled',
+            'signatures': len(signatures),
+            'options': {name: options[name] for name in ('seed', 'redraws', 'skilled_amount', 'margin')},
+            'distances': {
+                kind: {
+                    'pairs': len(values),
+                    **{f"p{q}": round(float(np.percentile(values, q)), 4) for q in (0, 5, 50, 95, 100)},
+                }
+                for kind, values in distances.items()
+            },
+            'accept_distance': round(accept, 4),
+            'reject_distance': round(reject, 4),
+            'genuine_accepted': round(float(np.mean(genuine <= accept)), 4),
+            'genuine_to_cnn': round(float(np.mean((genuine > accept) & (genuine < reject))), 4),
+            'forged_rejected': round(float(np.mean(forged >= reject)), 4),
+            'forged_accepted': round(float(np.mean(forged <= accept)), 4),
+        }
+        for kind, summary in report['distances'].items():
+            self.stdout.write(
+                f"{kind}: {summary['pairs']} pairs, min {summary['p0']}, median {summary['p50']}, max {summary['p100']}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+        if accept >= reject:
+            raise CommandError(
+                "Genuine and forged distances overlap too much for the cascade; keep SIGNATURE_STROKE_CASCADE off."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Recommended SIGNATURE_STROKE_ACCEPT_DISTANCE={report['accept_distance']} "
+            f"SIGNATURE_STROKE_REJECT_DISTANCE={report['reject_distance']}: accepts "
+            f"{report['genuine_accepted']:.1%} of genuine pairs outright, rejects {report['forged_rejected']:.1%} "
+            f"of forgeries outright and accepts none."
+        ))
@@ -0,0 +1,61 @@
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from account.embedding_backends import EMBEDDING_BACKENDS
+from account.evaluation import build_pairs, cosine_rows, enrolled_signatures
+from account.utils import embed_batch_locally
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare embedding backends on enrolled signatures: per-image latency and how often their "
+        "accept/reject decisions at SIGNATURE_THRESHOLD agree with the Keras backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', choices=list(EMBEDDING_BACKENDS), default=list(EMBEDDING_BACKENDS))
+        parser.add_argument('--limit', type=int, default=200, help="Number of enrolled signatures to sample.")
+        parser.add_argument('--angle', type=float, default=3.0, help="Rotation applied to build genuine probes.")
+
+    def handle(self, *args, **options):
+        signatures = enrolled_signatures(options['limit'])
+        if len(signatures) < 2:
+            raise CommandError("At least two enrolled signatures are needed to build impostor pairs.")
+
+        references, genuine, impostor = build_pairs(signatures, options['angle'])
+        threshold = settings.SIGNATURE_THRESHOLD
+
+        backends = ['keras'] + [name for name in options['backends'] if name != 'keras']
+        baseline = None
+        self.stdout.write(f"pairs={len(signatures)} genuine + {len(signatures)} impostor, threshold={threshold}")
+        self.stdout.write(
+            f"{'backend':<16}{'ms/img':>8}{'genuine acc':>13}{'impostor rej':>14}{'agreement':>11}{'max |Δ|':>9}"
+        )
+        for name in backends:
+            embed_batch_locally(references[:1], backend=name)
+
+            timings = []
+            embedded = {}
+            for label, batch in (('reference', references), ('genuine', genuine), ('impostor', impostor)):
+                rows = []
+                for image in batch:
+                    start = time.perf_counter()
+                    rows.append(embed_batch_locally(image[None, ...], backend=name)[0])
+                    timings.append(time.perf_counter() - start)
+                embedded[label] = np.stack(rows)
+
+            scores = np.concatenate([
+                cosine_rows(embedded['reference'], embedded['genuine']),
+                cosine_rows(embedded['reference'], embedded['impostor']),
+            ])
+            decisions = scores >= threshold
+            n = len(signatures)
+            if baseline is None:
+                baseline = (scores, decisions)
+            agreement = np.mean(decisions == baseline[1])
+            max_delta = np.max(np.abs(scores - baseline[0]))
+            self.stdout.write(
+                f"{name:<16}{np.mean(timings) * 1000:>8.2f}{np.mean(decisions[:n]):>13.1%}"
+                f"{np.mean(~decisions[n:]):>14.1%}{agreement:>11.1%}{max_delta:>9.4f}"
+            )
@@ -0,0 +1,38 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from account.embedding_backends import TFLITE_QUANTIZATIONS, convert_to_tflite, tflite_model_path
+from account.evaluation import enrolled_signatures
+from account.utils import preprocess_signature
+
+
+class Command(BaseCommand):
+    help = "Convert the signature model to TFLite (float16 and/or int8) and cache it in SIGNATURE_MODEL_DIR."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantizations', nargs='+', choices=TFLITE_QUANTIZATIONS, default=TFLITE_QUANTIZATIONS)
+        parser.add_argument('--calibration-samples', type=int, default=200,
+                            help="Enrolled signatures used to calibrate int8 activation ranges.")
+
+    def calibration_batches(self, limit):
+        batches = []
+        for signature in enrolled_signatures(limit):
+            try:
+                batches.append(preprocess_signature(signature)[None, ...])
+            except Exception as e:
+                self.stderr.write(f"Skipping unreadable signature: {e}")
+        return batches
+
+    def handle(self, *args, **options):
+        representative_batches = None
+        if 'int8' in options['quantizations']:
+            representative_batches = self.calibration_batches(options['calibration_samples'])
+            if not representative_batches:
+                raise CommandError("int8 quantization needs enrolled signatures to calibrate against; none were found.")
+
+        for quantization in options['quantizations']:
+            path = tflite_model_path(quantization)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(convert_to_tflite(quantization, representative_batches))
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path} ({size_mb:.1f} MB)."))
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from account.embedding_backends import get_embedding_backend
+from account.evaluation import enrolled_signatures
+from account.utils import preprocess_signature, project_features
+
+
+class Command(BaseCommand):
+    help = "Fit a PCA projection of pooled signature embeddings on enrolled signatures (for SIGNATURE_PCA_PATH)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--components', type=int, default=128)
+        parser.add_argument('--limit', type=int, default=5000, help="Number of enrolled signatures to fit on.")
+        parser.add_argument('--batch-size', type=int, default=32)
+        parser.add_argument('--output', default=settings.SIGNATURE_PCA_PATH or os.path.join(settings.SIGNATURE_MODEL_DIR, 'pca.npz'))
+
+    def handle(self, *args, **options):
+        signatures = enrolled_signatures(options['limit'])
+        if len(signatures) <= options['components']:
+            raise CommandError(
+                f"Need more than {options['components']} enrolled signatures to fit {options['components']} components; found {len(signatures)}."
+            )
+
+        backend = get_embedding_backend()
+        rows = []
+        for start in range(0, len(signatures), options['batch_size']):
+            batch = np.stack([preprocess_signature(s) for s in signatures[start:start + options['batch_size']]])
+            rows.append(project_features(backend.embed(batch), mode='pooled', projection=False))
+        pooled = np.concatenate(rows)
+
+        mean = pooled.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(pooled - mean, full_matrices=False)
+        components = vt[:options['components']].astype(np.float32)
+        explained = np.sum(singular_values[:options['components']] ** 2) / np.sum(singular_values ** 2)
+        tag = f"{options['components']}-{hashlib.sha256(components.tobytes()).hexdigest()[:8]}"
+
+        os.makedirs(os.path.dirname(options['output']), exist_ok=True)
+        np.savez(options['output'], mean=mean.astype(np.float32), components=components, tag=tag)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {options['output']} ({options['components']} components, {explained:.1%} of variance, tag {tag})."
+        ))
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+from account.models import User
+from account.query_size import measure_fetched_bytes
+
+DEFAULT_PATHS = [
+    '/digital_attendance/api/roles/',
+    '/digital_attendance/api/event/attendance/my_attendances/',
+    '/digital_attendance/api/event/attendance/my_attended_programs/',
+    '/digital_attendance/api/event/attendance/my_attended_organizations/',
+    '/digital_attendance/api/organization/organizations/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Call GET endpoints as a user (authenticated with a real JWT, so the user load is included) and report "
+        "queries, rows and bytes fetched from the database per endpoint. Fails if --budget is exceeded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help="User to call the endpoints as. Default: the first user.")
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+        parser.add_argument('--budget', type=int, help="Maximum bytes any endpoint may fetch.")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        user = users.filter(email=options['email']).first() if options['email'] else users.first()
+        if user is None:
+            raise CommandError("No such user.")
+        token = str(RefreshToken.for_user(user).access_token)
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost')
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}", HTTP_HOST=host)
+
+        over_budget = []
+        self.stdout.write(f"{'path':<70}{'status':>7}{'queries':>9}{'rows':>7}{'bytes':>10}")
+        for path in options['paths']:
+            with CaptureQueriesContext(connection) as queries, measure_fetched_bytes() as fetched:
+                response = client.get(path)
+            self.stdout.write(
+                f"{path:<70}{response.status_code:>7}{len(queries):>9}{fetched.rows:>7}{fetched.bytes:>10}"
+            )
+            if options['budget'] is not None and fetched.bytes > options['budget']:
+                over_budget.append(path)
+
+        if over_budget:
+            raise CommandError(f"Over the {options['budget']} byte budget: {', '.join(over_budget)}")
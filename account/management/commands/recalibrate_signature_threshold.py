@@ -0,0 +1,56 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from account.embedding_backends import get_embedding_backend
+from account.evaluation import build_pairs, cosine_rows, enrolled_signatures
+from account.utils import EMBEDDING_MODES, load_pca, project_features
+
+
+class Command(BaseCommand):
+    help = (
+        "Find the SIGNATURE_THRESHOLD for another embedding mode whose accept/reject decisions best "
+        "match the current mode and threshold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=EMBEDDING_MODES, default='pooled', help="Embedding mode to calibrate for.")
+        parser.add_argument('--pca-path', default='', help="PCA projection to apply in the target mode.")
+        parser.add_argument('--limit', type=int, default=500, help="Number of enrolled signatures to sample.")
+        parser.add_argument('--angle', type=float, default=3.0, help="Rotation applied to build genuine probes.")
+
+    def scores(self, features, mode, projection):
+        references, genuine, impostor = (project_features(f, mode=mode, projection=projection) for f in features)
+        return np.concatenate([cosine_rows(references, genuine), cosine_rows(references, impostor)])
+
+    def handle(self, *args, **options):
+        signatures = enrolled_signatures(options['limit'])
+        if len(signatures) < 2:
+            raise CommandError("At least two enrolled signatures are needed to build impostor pairs.")
+
+        backend = get_embedding_backend()
+        # The feature maps are shared; only the reduction differs between modes.
+        features = [backend.embed(batch) for batch in build_pairs(signatures, options['angle'])]
+
+        current = self.scores(features, settings.SIGNATURE_EMBEDDING_MODE, None)
+        target_projection = load_pca(options['pca_path']) if options['pca_path'] else False
+        target = self.scores(features, options['mode'], target_projection)
+        decisions = current >= settings.SIGNATURE_THRESHOLD
+
+        candidates = np.linspace(-1, 1, 2001)
+        agreement = np.array([np.mean((target >= t) == decisions) for t in candidates])
+        best = candidates[agreement == agreement.max()]
+        threshold = float(best[len(best) // 2])
+
+        n = len(signatures)
+        self.stdout.write(
+            f"Current: mode={settings.SIGNATURE_EMBEDDING_MODE} threshold={settings.SIGNATURE_THRESHOLD} "
+            f"accepts {np.mean(decisions[:n]):.1%} of genuine and {np.mean(decisions[n:]):.1%} of impostor pairs."
+        )
+        self.stdout.write(
+            f"Target: mode={options['mode']}{' + PCA' if target_projection else ''} "
+            f"mean |score shift|={np.mean(np.abs(target - current)):.4f}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Recommended SIGNATURE_THRESHOLD={threshold:.3f} ({agreement.max():.1%} decision agreement "
+            f"over {2 * n} pairs)."
+        ))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from account.verification_pool import VerificationPool
+
+
+class Command(BaseCommand):
+    help = "Run the shared signature verification pool that web workers connect to via SIGNATURE_POOL_ADDRESS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=settings.SIGNATURE_POOL_ADDRESS)
+        parser.add_argument('--workers', type=int, default=settings.SIGNATURE_POOL_WORKERS,
+                            help="Model-holding processes, i.e. inference concurrency.")
+        parser.add_argument('--queue-size', type=int, default=settings.SIGNATURE_POOL_QUEUE_SIZE,
+                            help="Outstanding batches accepted before callers are turned away.")
+        parser.add_argument('--task-timeout', type=float, default=settings.SIGNATURE_POOL_TIMEOUT)
+
+    def handle(self, *args, **options):
+        if not options['address']:
+            raise CommandError("Set SIGNATURE_POOL_ADDRESS or pass --address.")
+        self.stdout.write(f"Starting {options['workers']} signature workers on {options['address']}.")
+        VerificationPool(
+            options['address'],
+            workers=options['workers'],
+            queue_size=options['queue_size'],
+            task_timeout=options['task_timeout'],
+        ).serve_forever()
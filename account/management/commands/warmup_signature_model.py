@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from account.utils import warmup_signature_model
+from account.verification_pool import SignatureVerificationUnavailable
+
+
+class Command(BaseCommand):
+    help = "Load the signature model (downloading weights if needed) and run a warmup inference."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            warmup_signature_model()
+        except SignatureVerificationUnavailable:
+            raise CommandError("The signature verification pool at SIGNATURE_POOL_ADDRESS is unavailable.")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Signature model ready in {elapsed:.2f}s."))
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.17 on 2026-10-18 12:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_rename_can_add_superusers_user_can_add_staff_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignatureEmbedding',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('model_version', models.CharField(max_length=64)),
+                ('signature_hash', models.CharField(max_length=64)),
+                ('vector', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signature_embedding', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
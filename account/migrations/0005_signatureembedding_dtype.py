@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_signatureembedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signatureembedding',
+            name='dtype',
+            field=models.CharField(default='float32', max_length=16),
+        ),
+    ]
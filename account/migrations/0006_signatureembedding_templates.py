@@ -0,0 +1,34 @@
+# Generated by Django 4.2.17 on 2026-10-18 12:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_signatureembedding_dtype'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signatureembedding',
+            name='last_matched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='signatureembedding',
+            name='source',
+            field=models.CharField(choices=[('enrolled', 'Enrolled'), ('checkin', 'Check-in')], default='enrolled', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='signatureembedding',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signature_embeddings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='signatureembedding',
+            constraint=models.UniqueConstraint(condition=models.Q(('source', 'enrolled')), fields=('user',), name='unique_enrolled_signature_embedding'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-18 12:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0006_signatureembedding_templates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Signature',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('image', models.BinaryField()),
+                ('content_type', models.CharField(max_length=32)),
+                ('sha256', models.CharField(max_length=64)),
+                ('strokes', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signature', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,80 @@
+import base64
+import binascii
+import hashlib
+import io
+import json
+import zlib
+from django.db import migrations
+from PIL import Image
+
+# Same limits as account.preprocessing at the time of writing.
+WORKING_SIZE = 1024
+# content_type of signatures whose base64 couldn't be decoded; the image holds the original text.
+RAW_TEXT = 'text/plain'
+
+
+def _encode(data):
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    if max(img.size) > WORKING_SIZE:
+        img = img.reduce(max(img.size) // WORKING_SIZE)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        img = Image.alpha_composite(Image.new('RGBA', img.size, (255, 255, 255, 255)), img)
+    buffer = io.BytesIO()
+    img.convert('L').save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue(), 'image/png'
+
+
+def move_signatures(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    Signature = apps.get_model('account', 'Signature')
+    users = User.objects.exclude(signaturebase64__isnull=True).exclude(signaturebase64='') \
+        .values_list('id', 'signaturebase64', 'signaturejson')
+    for user_id, data_url, strokes in users.iterator(chunk_size=200):
+        header, _, payload = data_url.partition(',')
+        try:
+            data = base64.b64decode(payload)
+        except (binascii.Error, ValueError):
+            # 0009 drops the column, so keep the text itself; restore_signatures puts it back verbatim.
+            image, content_type = data_url.encode(), RAW_TEXT
+        else:
+            try:
+                image, content_type = _encode(data)
+            except Exception:
+                # Keep what we can't decode as it was rather than losing it.
+                image, content_type = data, header[len('data:'):].split(';')[0] or 'application/octet-stream'
+        Signature.objects.create(
+            user_id=user_id,
+            image=image,
+            content_type=content_type,
+            sha256=hashlib.sha256(image).hexdigest(),
+            strokes=zlib.compress(json.dumps(strokes, separators=(',', ':')).encode(), 9) if strokes is not None else None,
+        )
+
+
+def restore_signatures(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    Signature = apps.get_model('account', 'Signature')
+    for signature in Signature.objects.iterator(chunk_size=200):
+        if signature.content_type == RAW_TEXT:
+            data_url = bytes(signature.image).decode()
+        else:
+            data_url = f"data:{signature.content_type};base64," + base64.b64encode(bytes(signature.image)).decode()
+        User.objects.filter(id=signature.user_id).update(
+            signaturebase64=data_url,
+            signaturejson=json.loads(zlib.decompress(bytes(signature.strokes))) if signature.strokes else None,
+        )
+    # Moved back, so migrating forward again doesn't collide with them.
+    Signature.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0007_signature'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_signatures, restore_signatures),
+    ]
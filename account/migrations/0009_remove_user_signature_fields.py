@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0008_move_signatures_off_user'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='signaturebase64',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='signaturejson',
+        ),
+    ]
@@ -0,0 +1,42 @@
+import threading
+
+# Process-wide registry of heavyweight models. Loaders are registered by name
+# and only invoked the first time the model is requested, so importing this
+# module (or anything that registers a loader) never pulls in TensorFlow.
+_loaders = {}
+_instances = {}
+# Reentrant so a loader can fetch the models it is built on.
+_lock = threading.RLock()
+
+
+def register(name, loader):
+    """Register a zero-argument callable that builds the model called `name`."""
+    _loaders[name] = loader
+
+
+def get(name):
+    """Return the model called `name`, building it on first use."""
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None:
+            if name not in _loaders:
+                raise KeyError(f"No model registered under '{name}'.")
+            instance = _loaders[name]()
+            _instances[name] = instance
+    return instance
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+def clear(name=None):
+    """Drop cached instances so the next `get` rebuilds them."""
+    with _lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
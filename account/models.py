@@ -1,10 +1,20 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+import base64
+import json
 import uuid
+import zlib
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+import numpy as np
 
-class CustomUserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    def with_signature(self):
+        """Join the enrolled signature (without its image) for the verification paths."""
+        return self.select_related('signature').defer('signature__image')
+
+
+class CustomUserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def normalize_email(self, email):
         return email.lower()
 
@@ -67,8 +77,6 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(max_length=255, unique=True)
     phone = models.CharField(max_length=20, unique=True)
     name = models.CharField(max_length=255, blank=True, default="")
-    signaturebase64 = models.TextField(blank=True, null=True)
-    signaturejson = models.JSONField(blank=True, null=True)
 
     is_active = models.BooleanField(default=True)
     is_superuser = models.BooleanField(default=False)
@@ -100,4 +108,90 @@ class User(AbstractBaseUser, PermissionsMixin):
         return (self.email,)
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+class SignatureQuerySet(models.QuerySet):
+    def with_strokes(self):
+        """Load the strokes too; the image stays deferred."""
+        return self.defer(None).defer('image')
+
+    def with_image(self):
+        """Load every column, image included."""
+        return self.defer(None)
+
+
+class SignatureManager(models.Manager.from_queryset(SignatureQuerySet)):
+    def get_queryset(self):
+        # The blobs are only needed when verifying or embedding.
+        return super().get_queryset().defer('image', 'strokes')
+
+
+class Signature(models.Model):
+    """
+    A user's enrolled signature, kept off the User row so that loading users
+    doesn't drag the image along. The image is stored re-encoded (see
+    SIGNATURE_STORAGE_FORMAT) and the strokes as zlib-compressed JSON.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.OneToOneField('account.User', on_delete=models.CASCADE, related_name='signature')
+    image = models.BinaryField()
+    content_type = models.CharField(max_length=32)
+    sha256 = models.CharField(max_length=64)
+    strokes = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SignatureManager()
+
+    def image_bytes(self):
+        return bytes(self.image)
+
+    def data_url(self):
+        return f"data:{self.content_type};base64," + base64.b64encode(self.image_bytes()).decode()
+
+    def stroke_data(self):
+        if not self.strokes:
+            return None
+        return json.loads(zlib.decompress(bytes(self.strokes)))
+
+    def __str__(self):
+        return f"Signature of {self.user.email}"
+
+
+class SignatureEmbedding(models.Model):
+    """
+    One reference template of a user's signature. The enrolled template is
+    derived from the user's Signature; further templates are added from
+    successful check-ins, up to SIGNATURE_MAX_TEMPLATES per user.
+    """
+    ENROLLED = 'enrolled'
+    CHECKIN = 'checkin'
+    SOURCE_CHOICES = [
+        (ENROLLED, 'Enrolled'),
+        (CHECKIN, 'Check-in'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey('account.User', on_delete=models.CASCADE, related_name='signature_embeddings')
+    source = models.CharField(max_length=16, choices=SOURCE_CHOICES, default=ENROLLED)
+    model_version = models.CharField(max_length=64)
+    signature_hash = models.CharField(max_length=64)
+    vector = models.BinaryField()
+    dtype = models.CharField(max_length=16, default='float32')
+    last_matched_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(source='enrolled'), name='unique_enrolled_signature_embedding'
+            ),
+        ]
+
+    def to_array(self):
+        return np.frombuffer(self.vector, dtype=self.dtype).astype(np.float32)
+
+    def __str__(self):
+        return f"Signature {self.source} template of {self.user.email} ({self.model_version})"
@@ -0,0 +1,39 @@
+import io
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import JSONParser
+
+
+class SignatureUploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request body is too large."
+    default_code = 'request_too_large'
+
+
+class SignatureJSONParser(JSONParser):
+    """
+    JSON parser for endpoints that take a signature upload. Bodies over
+    SIGNATURE_MAX_UPLOAD_BYTES are refused from Content-Length alone, or after
+    reading one byte past the limit when it is missing or wrong.
+    """
+    limit_setting = 'SIGNATURE_MAX_UPLOAD_BYTES'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        limit = getattr(settings, self.limit_setting)
+        request = (parser_context or {}).get('request')
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0) if request is not None else 0
+        except ValueError:
+            length = 0
+        if length > limit:
+            raise SignatureUploadTooLarge()
+        body = stream.read(limit + 1)
+        if len(body) > limit:
+            raise SignatureUploadTooLarge()
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class BulkSignatureJSONParser(SignatureJSONParser):
+    """SignatureJSONParser for batches of signatures, capped at SIGNATURE_BULK_MAX_UPLOAD_BYTES."""
+    limit_setting = 'SIGNATURE_BULK_MAX_UPLOAD_BYTES'
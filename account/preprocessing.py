@@ -0,0 +1,174 @@
+import base64
+import binascii
+import io
+import time
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+INPUT_SIZE = 224
+# Canvases are shrunk to about this size before any pixel work; signatures
+# don't need more resolution than that to survive the resize to 224.
+WORKING_SIZE = 1024
+# Grey levels darker than this (out of 255) count as ink.
+INK_THRESHOLD = 200
+INK_MARGIN = 8
+# Bump whenever the steps below change, so stored embeddings are recomputed.
+PREPROCESSING_VERSION = 2
+# Base64 is decoded this many characters (a multiple of 4) at a time.
+DECODE_CHUNK_CHARS = 64 * 1024
+
+
+class InvalidSignature(ValueError):
+    pass
+
+
+class SignatureTooLarge(InvalidSignature):
+    pass
+
+
+class PreparedSignature:
+    """A signature decoded once, kept around for every later stage that needs it."""
+
+    def __init__(self, data, tensor, timings):
+        self.data = data
+        self.tensor = tensor
+        self.timings = timings
+
+
+def check_pixels(img):
+    width, height = img.size
+    if width * height > settings.SIGNATURE_MAX_PIXELS:
+        raise SignatureTooLarge(f"Signature image is too large ({width}x{height} pixels).")
+
+
+def _check_header(head):
+    # Most formats put their dimensions in the first few bytes, so a huge
+    # image is turned away before the rest of the payload is decoded.
+    try:
+        img = Image.open(io.BytesIO(head))
+    except Image.DecompressionBombError as e:
+        raise SignatureTooLarge(str(e))
+    except Exception:
+        return
+    check_pixels(img)
+
+
+def decode_data_url(value):
+    """
+    Decode a data-URL signature to image bytes (a bytearray), refusing
+    payloads over SIGNATURE_MAX_IMAGE_BYTES before decoding anything and
+    images over SIGNATURE_MAX_PIXELS after the first chunk. The payload is
+    decoded DECODE_CHUNK_CHARS at a time straight into one buffer of the
+    final size, so no full-size intermediate copy is made.
+    """
+    if not isinstance(value, str) or not value.startswith("data:image"):
+        raise InvalidSignature("Invalid base64 signature format. Must start with 'data:image'.")
+    payload = value.partition(",")[2]
+    if not payload:
+        raise InvalidSignature("Invalid base64 data: empty payload")
+    if len(payload) * 3 // 4 > settings.SIGNATURE_MAX_IMAGE_BYTES:
+        raise SignatureTooLarge(f"Signature image is larger than {settings.SIGNATURE_MAX_IMAGE_BYTES} bytes.")
+    if len(payload) % 4:
+        raise InvalidSignature("Invalid base64 data: incorrect padding")
+    padding = len(payload) - len(payload.rstrip('='))
+    if padding > 2:
+        raise InvalidSignature("Invalid base64 data: incorrect padding")
+    data = bytearray(len(payload) // 4 * 3 - padding)
+    written = 0
+    try:
+        for start in range(0, len(payload), DECODE_CHUNK_CHARS):
+            chunk = payload[start:start + DECODE_CHUNK_CHARS]
+            if '=' in chunk and start + DECODE_CHUNK_CHARS < len(payload):
+                raise binascii.Error("padding before the end of the data")
+            decoded = base64.b64decode(chunk, validate=True)
+            data[written:written + len(decoded)] = decoded
+            written += len(decoded)
+            if start == 0 and len(payload) > DECODE_CHUNK_CHARS:
+                _check_header(decoded)
+    except InvalidSignature:
+        raise
+    except ValueError as e:
+        raise InvalidSignature(f"Invalid base64 data: {e}")
+    return data
+
+
+def flatten_to_gray(img):
+    # Transparent canvases must become white paper, not black.
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img)
+    return img.convert('L')
+
+
+def _crop_to_ink(gray):
+    bbox = gray.point(lambda p: 255 if p < INK_THRESHOLD else 0).getbbox()
+    if bbox is None:
+        return gray
+    left, top, right, bottom = bbox
+    return gray.crop((
+        max(left - INK_MARGIN, 0),
+        max(top - INK_MARGIN, 0),
+        min(right + INK_MARGIN, gray.width),
+        min(bottom + INK_MARGIN, gray.height),
+    ))
+
+
+def _pad_to_square(gray):
+    side = max(gray.size)
+    square = Image.new('L', (side, side), 255)
+    square.paste(gray, ((side - gray.width) // 2, (side - gray.height) // 2))
+    return square
+
+
+def prepare_signature(value):
+    """
+    Decode a data-URL signature and turn it into a MobileNetV2-ready
+    (224, 224, 3) float32 array: shrink oversized canvases while decoding,
+    flatten onto white, crop to the ink and pad to a square so strokes keep
+    their aspect ratio. Raises InvalidSignature for anything unreadable.
+    """
+    start = time.perf_counter()
+    data = decode_data_url(value)
+    return prepare_signature_bytes(data, {'base64': time.perf_counter() - start})
+
+
+def prepare_signature_bytes(data, timings=None):
+    """Same as prepare_signature, for image bytes that are already decoded from base64."""
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as e:
+        raise SignatureTooLarge(str(e))
+    except Exception as e:
+        raise InvalidSignature(f"Invalid image: {e}")
+    # Only the header has been read so far; refuse decompression bombs before decoding.
+    check_pixels(img)
+    try:
+        # JPEG can decode straight at 1/2, 1/4 or 1/8 scale; a no-op for other formats.
+        img.draft(img.mode, (WORKING_SIZE, WORKING_SIZE))
+        img.load()
+    except Exception as e:
+        raise InvalidSignature(f"Invalid image: {e}")
+    if max(img.size) > WORKING_SIZE:
+        img = img.reduce(max(img.size) // WORKING_SIZE)
+    timings['decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gray = _pad_to_square(_crop_to_ink(flatten_to_gray(img)))
+    timings['crop'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pixels = np.asarray(gray.resize((INPUT_SIZE, INPUT_SIZE)), dtype=np.float32)
+    # Same scaling as mobilenet_v2.preprocess_input, repeated across RGB.
+    tensor = np.repeat((pixels / 127.5 - 1.0)[..., None], 3, axis=2)
+    timings['resize'] = time.perf_counter() - start
+
+    return PreparedSignature(data, tensor, timings)
+
+
+def server_timing(timings):
+    """Format stage timings (seconds) as a Server-Timing header value in milliseconds."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
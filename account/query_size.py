@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def value_size(value):
+    """Rough wire size of one fetched column value."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (bool, int, float)):
+        return 8
+    return len(str(value))
+
+
+class FetchStats:
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+
+    def add(self, rows):
+        for row in rows:
+            self.rows += 1
+            self.bytes += sum(value_size(value) for value in row)
+
+
+class CountingCursor:
+    """DB-API cursor proxy that adds every fetched row to a FetchStats."""
+
+    def __init__(self, cursor, stats):
+        self.cursor = cursor
+        self.stats = stats
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.stats.add([row])
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.cursor.fetchmany(size) if size is not None else self.cursor.fetchmany()
+        self.stats.add(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.stats.add(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.stats.add([row])
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+@contextmanager
+def measure_fetched_bytes(using=DEFAULT_DB_ALIAS):
+    """
+    Count rows and approximate bytes fetched by queries run on the `using`
+    connection inside the block. Installed with execute_wrapper(), so it only
+    sees this thread's connection and is removed however the block exits.
+    """
+    stats = FetchStats()
+
+    def count_fetches(execute, sql, params, many, context):
+        cursor = context['cursor']
+        if isinstance(cursor.cursor, CountingCursor):
+            cursor.cursor.stats = stats
+        else:
+            cursor.cursor = CountingCursor(cursor.cursor, stats)
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(count_fetches):
+        yield stats
@@ -1,8 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
-import base64
-from io import BytesIO
-from PIL import Image
 from .models import User
+from .preprocessing import InvalidSignature, prepare_signature
+from .signature_storage import save_signature
+from .utils import embed_prepared, store_signature_embedding
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -29,22 +30,10 @@ class UserCreateSerializer(serializers.Serializer):
     def validate_signature_base64(self, value):
         """Validate if the base64 string is a valid image."""
         try:
-            # Check if it starts with a data URL prefix for an image
-            if not value.startswith("data:image"):
-                raise serializers.ValidationError("Invalid base64 signature format. Must start with 'data:image'.")
-            
-            # Extract the base64 part by removing the data URL scheme
-            base64_data = value.split(",")[1]
-
-            # Try decoding and open the image
-            image_data = base64.b64decode(base64_data)
-            image = Image.open(BytesIO(image_data))
-
-            # Verify the image to ensure it's valid and not corrupted
-            image.verify()  # This will raise an error if the image is invalid
-            
-        except Exception as e:
-            raise serializers.ValidationError(f"Invalid image: {str(e)}")
+            # Decoded once here; create() reuses the prepared tensor
+            self.prepared_signature = prepare_signature(value)
+        except InvalidSignature as e:
+            raise serializers.ValidationError(str(e))
         
         return value
     def create(self, validated_data):
@@ -53,17 +42,18 @@ class UserCreateSerializer(serializers.Serializer):
         email = validated_data.get('email')
         phone = validated_data.get('phone')
         name = validated_data.get('name')
-        signature_base64 = validated_data.get('signature_base64')
         signature_stroke = validated_data.get('signature_stroke', None)
         
-        # Create a new User instance (make sure to save the signature or any other fields)
-        user = User.objects.create(
-            email=email,
-            phone=phone,
-            name=name,
-            signaturebase64=signature_base64,
-            signaturejson=signature_stroke,
-        )
+        # Create a new User instance; the signature lives in its own table
+        with transaction.atomic():
+            user = User.objects.create(
+                email=email,
+                phone=phone,
+                name=name,
+            )
+            save_signature(user, self.prepared_signature.data, signature_stroke)
+            # Embed the enrolled signature once so verification only has to embed the probe
+            store_signature_embedding(user, embedding=embed_prepared([self.prepared_signature])[0])
         
         return user
 
@@ -76,4 +66,12 @@ class UserAdminSerializer(serializers.ModelSerializer):
     revoked_staff_status_by = UserSerializer()
     class Meta:
         model = User
-        fields = '__all__'
+        # Listed explicitly so credentials and anything added to User later stay out of the payload
+        fields = [
+            'id', 'email', 'phone', 'name', 'is_active', 'is_superuser', 'is_staff', 'date_joined', 'last_seen',
+            'banned_by', 'unbanned_by', 'banned_at', 'unbanned_at', 'can_create_organizations',
+            'granted_organizational_permission_by', 'revoked_organizational_permission_by',
+            'granted_organizational_permission_at', 'revoked_organizational_permission_at',
+            'can_add_staff', 'can_revoke_staff', 'granted_staff_status_by', 'revoked_staff_status_by',
+            'granted_staff_status_at', 'revoked_staff_status_at',
+        ]
@@ -0,0 +1,94 @@
+import hashlib
+import io
+import json
+import zlib
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+from .models import Signature
+from .preprocessing import WORKING_SIZE, InvalidSignature, check_pixels, flatten_to_gray
+
+CONTENT_TYPES = {'png': 'image/png', 'webp': 'image/webp'}
+
+
+def encode_signature_image(data):
+    """
+    Re-encode uploaded image bytes for storage: flattened onto white, grey
+    and shrunk like the preprocessing pipeline would, so nothing the model
+    sees is lost. Returns (bytes, content type).
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        check_pixels(img)
+        img.load()
+    except InvalidSignature:
+        raise
+    except Exception as e:
+        raise InvalidSignature(f"Invalid image: {e}")
+    if max(img.size) > WORKING_SIZE:
+        img = img.reduce(max(img.size) // WORKING_SIZE)
+    gray = flatten_to_gray(img)
+    buffer = io.BytesIO()
+    if settings.SIGNATURE_STORAGE_FORMAT == 'webp':
+        gray.save(buffer, format='WEBP', lossless=True, method=6)
+    else:
+        gray.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue(), CONTENT_TYPES[settings.SIGNATURE_STORAGE_FORMAT]
+
+
+def compress_strokes(strokes):
+    if strokes is None:
+        return None
+    return zlib.compress(json.dumps(strokes, separators=(',', ':')).encode(), 9)
+
+
+def save_signature(user, data, strokes=None):
+    """Store (or replace) the user's enrolled signature from decoded image bytes and stroke JSON."""
+    image, content_type = encode_signature_image(data)
+    signature, _ = Signature.objects.update_or_create(
+        user=user,
+        defaults={
+            'image': image,
+            'content_type': content_type,
+            'sha256': hashlib.sha256(image).hexdigest(),
+            'strokes': compress_strokes(strokes),
+        }
+    )
+    if hasattr(user, '_enrolled_signature'):
+        del user._enrolled_signature
+    return signature
+
+
+def get_signature(user):
+    """
+    The user's Signature or None. The image column is deferred until used,
+    since checking freshness and strokes doesn't need it. Reuses a join made
+    by User.objects.with_signature() and is cached on `user`.
+    """
+    if not hasattr(user, '_enrolled_signature'):
+        if type(user).signature.is_cached(user):
+            try:
+                user._enrolled_signature = user.signature
+            except Signature.DoesNotExist:
+                user._enrolled_signature = None
+        else:
+            user._enrolled_signature = Signature.objects.with_strokes().filter(user=user).first()
+    return user._enrolled_signature
+
+
+def signature_etag(signature, size):
+    return f'"{signature.sha256[:32]}-{size}"'
+
+
+def signature_thumbnail(signature, size):
+    """PNG of the stored signature scaled to fit `size` x `size`, cached by content hash."""
+    key = f"signature-thumbnail:{signature.sha256}:{size}"
+    thumbnail = cache.get(key)
+    if thumbnail is None:
+        img = Image.open(io.BytesIO(signature.image_bytes()))
+        img.thumbnail((size, size))
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG', optimize=True)
+        thumbnail = buffer.getvalue()
+        cache.set(key, thumbnail, timeout=None)
+    return thumbnail
@@ -0,0 +1,85 @@
+import numpy as np
+
+# Points per signature after resampling, spread over strokes by their length.
+RESAMPLE_POINTS = 64
+# DTW may only drift this fraction of the sequence away from the diagonal.
+DTW_BAND = 0.15
+
+
+def parse_strokes(strokes):
+    """
+    Turn the client's [[{"x": .., "y": ..}, ...], ...] stroke JSON into a list
+    of (k, 2) float arrays, or None if it is missing or unusable.
+    """
+    if not isinstance(strokes, list):
+        return None
+    parsed = []
+    try:
+        for stroke in strokes:
+            points = np.array([(point['x'], point['y']) for point in stroke], dtype=np.float64)
+            if len(points):
+                parsed.append(points)
+    except (TypeError, KeyError, ValueError):
+        return None
+    if not parsed or sum(len(points) for points in parsed) < 2 or not np.isfinite(np.concatenate(parsed)).all():
+        return None
+    return parsed
+
+
+def _resample(points, count):
+    if len(points) == 1 or count == 1:
+        return np.repeat(points[:1], count, axis=0)
+    distance = np.concatenate([[0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))])
+    if distance[-1] == 0:
+        return np.repeat(points[:1], count, axis=0)
+    targets = np.linspace(0, distance[-1], count)
+    return np.column_stack([np.interp(targets, distance, points[:, 0]), np.interp(targets, distance, points[:, 1])])
+
+
+def normalize_strokes(strokes, points=RESAMPLE_POINTS):
+    """
+    Resample strokes to about `points` evenly spaced points in drawing order,
+    centred on their centroid and scaled to unit RMS radius, so canvas size,
+    position and sampling rate don't matter.
+    """
+    lengths = np.array([np.linalg.norm(np.diff(stroke, axis=0), axis=1).sum() for stroke in strokes])
+    total = lengths.sum()
+    shares = lengths / total if total > 0 else np.full(len(strokes), 1 / len(strokes))
+    sequence = np.concatenate([
+        _resample(stroke, max(2, int(round(share * points))))
+        for stroke, share in zip(strokes, shares)
+    ])
+    sequence -= sequence.mean(axis=0)
+    scale = np.sqrt((sequence ** 2).sum(axis=1).mean())
+    return sequence / scale if scale > 0 else sequence
+
+
+def dtw_distance(a, b, band=DTW_BAND):
+    """
+    Banded dynamic time warping between two (n, 2) sequences, normalised by
+    path length. Cells are filled one anti-diagonal at a time so each step is
+    a single vector operation.
+    """
+    n, m = len(a), len(b)
+    cost = np.linalg.norm(a[:, None, :] - b[None, :, :], axis=2)
+    width = max(int(band * max(n, m)), abs(n - m)) + 1
+    rows, cols = np.indices((n, m))
+    cost[np.abs(rows * m / n - cols) > width] = np.inf
+
+    total = np.full((n + 1, m + 1), np.inf)
+    total[0, 0] = 0
+    for diagonal in range(2, n + m + 1):
+        i = np.arange(max(1, diagonal - m), min(n, diagonal - 1) + 1)
+        j = diagonal - i
+        total[i, j] = cost[i - 1, j - 1] + np.minimum(
+            total[i - 1, j - 1], np.minimum(total[i - 1, j], total[i, j - 1])
+        )
+    return float(total[n, m] / (n + m))
+
+
+def stroke_distance(reference, probe):
+    """DTW distance between two stroke JSON values, or None if either can't be used."""
+    reference, probe = parse_strokes(reference), parse_strokes(probe)
+    if reference is None or probe is None:
+        return None
+    return dtw_distance(normalize_strokes(reference), normalize_strokes(probe))
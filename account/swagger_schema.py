@@ -1,4 +1,4 @@
-from drf_spectacular.utils import OpenApiResponse, OpenApiExample, inline_serializer, extend_schema
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, OpenApiExample, inline_serializer, extend_schema
 from rest_framework import serializers
 from .serializers import UserCreateSerializer, UserSerializer 
 
@@ -54,6 +54,7 @@ email_login_schema = extend_schema(
             "properties": {
                 "email": {"type": "string", "example": "user@example.com"},
                 "signature_base64": {"type": "string", "example": "data:image/png;base64,iVBO..."},
+                "signature_stroke": {"type": "array", "items": {"type": "array", "items": {"type": "object"}}, "example": [[{"x": 10, "y": 20}, {"x": 12, "y": 24}]]},
             },
             "required": ["email", "signature_base64"],
         }
@@ -123,6 +124,7 @@ phone_login_schema = extend_schema(
             "properties": {
                 "phone": {"type": "string", "example": "+251900000000"},
                 "signature_base64": {"type": "string", "example": "data:image/png;base64,iVBO..."},
+                "signature_stroke": {"type": "array", "items": {"type": "array", "items": {"type": "object"}}, "example": [[{"x": 10, "y": 20}, {"x": 12, "y": 24}]]},
             },
             "required": ["phone", "signature_base64"],
         }
@@ -183,4 +185,26 @@ phone_login_schema = extend_schema(
     },
     description="Login using phone number and base64-encoded signature comparison.",
     tags=["1. Register and login"]
-)
\ No newline at end of file
+)
+
+signature_thumbnail_schema = extend_schema(
+    parameters=[
+        OpenApiParameter('size', int, description="Largest edge in pixels (default 128, capped by the server)."),
+        OpenApiParameter('user', str, description="Another user's id (staff only)."),
+    ],
+    responses={
+        (200, 'image/png'): OpenApiResponse(description="PNG thumbnail; send its ETag back in If-None-Match."),
+        304: OpenApiResponse(description="Not modified."),
+        404: OpenApiResponse(
+            description="Not Found",
+            response=inline_serializer(
+                name="SignatureThumbnailNotFound",
+                fields={
+                    "detail": serializers.CharField()
+                }
+            ),
+        ),
+    },
+    description="Thumbnail of the enrolled signature. Signatures are not part of any user payload.",
+    tags=["1. Register and login"]
+)
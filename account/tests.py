@@ -1,3 +1,406 @@
-from django.test import TestCase
+import base64
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from .benchmarks import preprocessing_samples, summarize, synthetic_signatures, time_calls
+from .evaluation import degenerate_strokes, redraw_strokes, synthetic_strokes
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import Signature, SignatureEmbedding, User
+from .preprocessing import (
+    DECODE_CHUNK_CHARS, InvalidSignature, SignatureTooLarge, decode_data_url, prepare_signature, prepare_signature_bytes,
+)
+from .query_size import measure_fetched_bytes
+from .signature_storage import get_signature, save_signature
+from .utils import (
+    _stroke_stage, add_signature_template, match_signature, match_signatures, store_signature_embedding,
+)
+from .verification_pool import SignatureVerificationUnavailable
 
-# Create your tests here.
+LOGIN_URL = '/digital_attendance/api/account/users/email_login/'
+
+
+def render_strokes(strokes, size=256):
+    """PNG bytes of stroke JSON drawn in black on white."""
+    points = np.concatenate([[(p['x'], p['y']) for p in stroke] for stroke in strokes])
+    low, span = points.min(axis=0), max(np.ptp(points, axis=0).max(), 1)
+    img = Image.new('L', (size, size), 255)
+    draw = ImageDraw.Draw(img)
+    for stroke in strokes:
+        line = [tuple(8 + (np.array((p['x'], p['y'])) - low) * (size - 16) / span) for p in stroke]
+        draw.line(line, fill=0, width=3)
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def data_url(data):
+    return "data:image/png;base64," + base64.b64encode(data).decode()
+
+
+def enroll(index, strokes):
+    user = User.objects.create_user(f"user{index}@example.com", f"0911{index:06d}")
+    save_signature(user, render_strokes(strokes), strokes)
+    return user
+
+
+class StrokeCascadeTests(TestCase):
+    def setUp(self):
+        self.strokes = synthetic_strokes(np.random.default_rng(1))
+        self.user = enroll(0, self.strokes)
+
+    def test_cascade_is_off_by_default(self):
+        from django.conf import settings
+        self.assertFalse(settings.SIGNATURE_STROKE_CASCADE)
+        self.assertIsNone(_stroke_stage(self.user, self.strokes))
+
+    @override_settings(SIGNATURE_STROKE_CASCADE=True)
+    def test_identical_strokes_are_accepted(self):
+        probe = data_url(render_strokes(self.strokes))
+        self.assertEqual(match_signature(self.user, probe, self.strokes), (True, 'stroke_accept'))
+
+    @override_settings(SIGNATURE_STROKE_CASCADE=True)
+    def test_other_signatures_are_never_stroke_accepted(self):
+        rng = np.random.default_rng(2)
+        for index in range(1, 51):
+            other = synthetic_strokes(rng)
+            self.assertNotEqual(_stroke_stage(self.user, other), (True, 'stroke_accept'), f"signature {index}")
+
+    @override_settings(SIGNATURE_STROKE_CASCADE=True)
+    def test_careful_copies_are_never_stroke_accepted(self):
+        rng = np.random.default_rng(3)
+        for index in range(50):
+            copy = redraw_strokes(self.strokes, rng, amount=3.0)
+            self.assertNotEqual(_stroke_stage(self.user, copy), (True, 'stroke_accept'), f"copy {index}")
+
+    @override_settings(SIGNATURE_STROKE_CASCADE=True)
+    def test_scribbles_are_never_stroke_accepted(self):
+        rng = np.random.default_rng(4)
+        users = [self.user] + [enroll(index, synthetic_strokes(rng)) for index in range(1, 50)]
+        for name, scribble in degenerate_strokes().items():
+            for user in users:
+                self.assertNotEqual(_stroke_stage(user, scribble), (True, 'stroke_accept'), f"{name} vs {user}")
+
+    @override_settings(SIGNATURE_STROKE_CASCADE=True)
+    def test_unreadable_image_is_refused_despite_matching_strokes(self):
+        garbage = "data:image/png;base64," + base64.b64encode(b"not an image").decode()
+        with self.assertRaises(InvalidSignature):
+            match_signature(self.user, garbage, self.strokes)
+
+        response = self.client.post(LOGIN_URL, {
+            'email': self.user.email,
+            'signature_base64': garbage,
+            'signature_stroke': self.strokes,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('access_token', response.json())
+
+
+def unit(*values):
+    vector = np.zeros(4, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector / np.linalg.norm(vector)
+
+
+ENROLLED = unit(1)
+
+
+@override_settings(SIGNATURE_EMBEDDING_CACHE_SIZE=0, SIGNATURE_MAX_TEMPLATES=3)
+class TemplateAdoptionTests(TestCase):
+    """Embeddings are looked up by image bytes instead of running the CNN; the enrolled image maps to ENROLLED."""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(5)
+        self.strokes = synthetic_strokes(self.rng)
+        self.user = enroll(0, self.strokes)
+        self.vectors = {}
+        patcher = mock.patch('account.utils.embed_prepared', side_effect=self.embed)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def embed(self, prepared, timings=None):
+        return np.stack([self.vectors.get(bytes(signature.data), ENROLLED) for signature in prepared])
+
+    def probe(self, vector):
+        data = render_strokes(synthetic_strokes(self.rng))
+        self.vectors[data] = vector
+        return data
+
+    def checkins(self):
+        return SignatureEmbedding.objects.filter(user=self.user, source=SignatureEmbedding.CHECKIN)
+
+    def test_confident_accept_is_adopted(self):
+        self.assertEqual(match_signature(self.user, data_url(self.probe(unit(0.85, 0.53)))), (True, 'cnn_accept'))
+        self.assertEqual(self.checkins().count(), 1)
+
+    def test_borderline_accept_is_not_adopted(self):
+        self.assertEqual(match_signature(self.user, data_url(self.probe(unit(0.6, 0.8)))), (True, 'cnn_accept'))
+        self.assertFalse(self.checkins().exists())
+
+    def test_redundant_accept_is_not_adopted(self):
+        self.assertEqual(match_signature(self.user, data_url(self.probe(unit(0.99, 0.14)))), (True, 'cnn_accept'))
+        self.assertFalse(self.checkins().exists())
+
+    def test_adoption_is_judged_against_the_enrolled_template(self):
+        # Close to an adopted check-in template but only borderline against the enrolled one.
+        match_signature(self.user, data_url(self.probe(unit(0.8, 0.6))))
+        self.assertEqual(self.checkins().count(), 1)
+        drifted = unit(0.7, 0.5667, 0.4347)
+        self.assertEqual(match_signature(self.user, data_url(self.probe(drifted))), (True, 'cnn_accept'))
+        self.assertEqual(self.checkins().count(), 1)
+
+    @override_settings(SIGNATURE_STROKE_CASCADE=True)
+    def test_stroke_accept_is_never_adopted(self):
+        probe = data_url(self.probe(unit(0.85, 0.53)))
+        self.assertEqual(match_signature(self.user, probe, self.strokes), (True, 'stroke_accept'))
+        self.assertFalse(self.checkins().exists())
+
+    def adopt(self, vector):
+        prepared = prepare_signature_bytes(self.probe(vector))
+        return add_signature_template(self.user, prepared, vector, 0.85, 0.85)
+
+    def test_lru_evicts_least_recently_matched(self):
+        first, second = self.adopt(unit(0.85, 0.53)), self.adopt(unit(0.85, 0, 0.53))
+        self.checkins().filter(id=first.id).update(last_matched_at=timezone.now() + timedelta(minutes=1))
+        third = self.adopt(unit(0.85, 0, 0, 0.53))
+        self.assertFalse(self.checkins().filter(id=second.id).exists())
+        self.assertEqual(set(self.checkins().values_list('id', flat=True)), {first.id, third.id})
+
+    @override_settings(SIGNATURE_TEMPLATE_EVICTION='fifo')
+    def test_fifo_evicts_oldest(self):
+        first, second = self.adopt(unit(0.85, 0.53)), self.adopt(unit(0.85, 0, 0.53))
+        self.checkins().filter(id=first.id).update(last_matched_at=timezone.now() + timedelta(minutes=1))
+        third = self.adopt(unit(0.85, 0, 0, 0.53))
+        self.assertEqual(set(self.checkins().values_list('id', flat=True)), {second.id, third.id})
+
+    def test_enrolled_template_is_never_evicted(self):
+        match_signature(self.user, data_url(self.probe(unit(0.85, 0.53))))
+        for vector in (unit(0.85, 0, 0.53), unit(0.85, 0, 0, 0.53), unit(0.8, 0.35, 0.35, 0.33)):
+            self.adopt(vector)
+        self.assertEqual(self.checkins().count(), 2)
+        self.assertTrue(SignatureEmbedding.objects.filter(user=self.user, source=SignatureEmbedding.ENROLLED).exists())
+
+
+@override_settings(SIGNATURE_EMBEDDING_CACHE_SIZE=0, SIGNATURE_BATCH_MAX_SIZE=2)
+class MatchSignaturesTests(TestCase):
+    def setUp(self):
+        self.strokes = synthetic_strokes(np.random.default_rng(6))
+        self.user = enroll(0, self.strokes)
+        store_signature_embedding(self.user, ENROLLED)
+        self.calls = []
+
+    def prepare(self, probe):
+        self.calls.append('prepare')
+        return prepare_signature(probe)
+
+    def embed(self, prepared, timings=None):
+        self.calls.append(len(prepared))
+        return np.stack([ENROLLED] * len(prepared))
+
+    def test_each_chunk_is_scored_before_the_next_is_decoded(self):
+        probe = data_url(render_strokes(self.strokes))
+        items = [(self.user, probe, None)] * 5
+        with mock.patch('account.utils.prepare_signature', side_effect=self.prepare), \
+                mock.patch('account.utils.embed_prepared', side_effect=self.embed):
+            results = match_signatures(items)
+        self.assertEqual(results, [(True, 'cnn_accept')] * 5)
+        self.assertEqual(self.calls, ['prepare', 'prepare', 2, 'prepare', 'prepare', 2, 'prepare', 1])
+
+
+def noisy_signature(seed=0, size=400):
+    """PNG bytes that don't compress, so a fetched signature blob can't hide in a byte budget."""
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'L').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def bearer(user):
+    return f"Bearer {RefreshToken.for_user(user).access_token}"
+
+
+class QuerySizeTests(TestCase):
+    """Bytes fetched from the database stay far below one enrolled signature."""
+    BUDGETS = {
+        '/digital_attendance/api/roles/': 2_000,
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user("budget@example.com", "0911000000")
+        save_signature(self.user, noisy_signature(), synthetic_strokes(np.random.default_rng(0)))
+        self.image_bytes = len(Signature.objects.with_image().get(user=self.user).image)
+
+    def test_fetched_bytes_are_counted(self):
+        with measure_fetched_bytes() as fetched:
+            Signature.objects.with_image().get(user=self.user)
+        self.assertEqual(fetched.rows, 1)
+        self.assertGreater(fetched.bytes, self.image_bytes)
+
+    def test_user_and_signature_lookups_skip_the_blob(self):
+        with measure_fetched_bytes() as fetched:
+            user = User.objects.with_signature().get(id=self.user.id)
+            get_signature(user).sha256
+        self.assertLess(fetched.bytes, 8_000)
+        self.assertGreater(self.image_bytes, 100_000)
+
+    def test_endpoint_byte_budgets(self):
+        for path, budget in self.BUDGETS.items():
+            with measure_fetched_bytes() as fetched:
+                response = self.client.get(path, HTTP_AUTHORIZATION=bearer(self.user))
+            self.assertEqual(response.status_code, 200, path)
+            self.assertLessEqual(fetched.bytes, budget, path)
+            self.assertLessEqual(len(response.content), budget, path)
+
+
+class SignatureUploadTests(TestCase):
+    def test_chunked_decoding_matches_base64(self):
+        data = noisy_signature()
+        self.assertGreater(len(data) * 4 // 3, DECODE_CHUNK_CHARS * 2)
+        self.assertEqual(decode_data_url(data_url(data)), data)
+        self.assertEqual(decode_data_url(data_url(data[:-1])), data[:-1])
+
+    def test_malformed_base64_is_refused(self):
+        encoded = data_url(noisy_signature())
+        for bad in [encoded[:-1], encoded[:100] + "=" + encoded[101:], encoded[:-4] + "!!!!"]:
+            with self.assertRaises(InvalidSignature):
+                decode_data_url(bad)
+
+    @override_settings(SIGNATURE_MAX_PIXELS=10_000)
+    def test_huge_image_is_refused_after_the_first_chunk(self):
+        with self.assertRaises(SignatureTooLarge):
+            decode_data_url(data_url(noisy_signature()))
+
+    def test_form_encoded_requests_are_still_parsed(self):
+        response = self.client.post(LOGIN_URL, {'email': "nobody@example.com"})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(SIGNATURE_MAX_UPLOAD_BYTES=1_000)
+    def test_oversized_json_is_refused(self):
+        response = self.client.post(LOGIN_URL, {'email': "x" * 2_000}, content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+
+
+def fake_embed_images(items):
+    return [user_id for user_id, _ in items], np.ones((len(items), 4), dtype=np.float32), {}
+
+
+@mock.patch('account.management.commands.backfill_signature_embeddings.embed_images', side_effect=fake_embed_images)
+class BackfillCheckpointTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        for index in range(5):
+            enroll(index, synthetic_strokes(rng))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'backfill.checkpoint')
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        call_command(
+            'backfill_signature_embeddings', '--batch-size', '2', '--checkpoint', self.checkpoint, *args,
+            stdout=out, stderr=io.StringIO(),
+        )
+        return out.getvalue()
+
+    def enrolled(self):
+        return SignatureEmbedding.objects.filter(source=SignatureEmbedding.ENROLLED)
+
+    def test_completed_run_removes_the_checkpoint(self, embed):
+        self.assertIn("Stored 5 signature embeddings", self.backfill())
+        self.assertFalse(os.path.exists(self.checkpoint))
+        self.assertIn("Stored 5 signature embeddings", self.backfill('--force'))
+
+    def test_interrupted_run_resumes_after_the_last_committed_batch(self, embed):
+        calls = []
+
+        def fail_second_batch(items):
+            calls.append(items)
+            if len(calls) == 2:
+                raise RuntimeError("killed")
+            return fake_embed_images(items)
+
+        embed.side_effect = fail_second_batch
+        with self.assertRaises(RuntimeError):
+            self.backfill('--force')
+        self.assertEqual(self.enrolled().count(), 2)
+        with open(self.checkpoint) as f:
+            first_batch_last = f.read()
+        self.assertEqual(first_batch_last, str(Signature.objects.order_by('pk').values_list('pk', flat=True)[1]))
+
+        embed.side_effect = fake_embed_images
+        self.assertIn("Stored 3 signature embeddings", self.backfill('--force'))
+        self.assertEqual(self.enrolled().count(), 5)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+class WarmupTests(TestCase):
+    @override_settings(SIGNATURE_MODEL_WARMUP=True, SIGNATURE_POOL_ADDRESS='/nonexistent/pool.sock')
+    @mock.patch('account.utils.run_signature_model')
+    def test_boot_skips_warmup_when_a_pool_is_configured(self, run):
+        apps.get_app_config('account').ready()
+        run.assert_not_called()
+
+    @override_settings(SIGNATURE_MODEL_WARMUP=True, SIGNATURE_POOL_ADDRESS='')
+    @mock.patch('account.utils.run_signature_model')
+    def test_boot_warms_up_the_local_model(self, run):
+        apps.get_app_config('account').ready()
+        run.assert_called_once()
+
+    @mock.patch('account.utils.run_signature_model', side_effect=SignatureVerificationUnavailable)
+    def test_verification_worker_starts_while_the_pool_is_down(self, run):
+        err = io.StringIO()
+        call_command('process_attendance_verifications', '--once', stdout=io.StringIO(), stderr=err)
+        self.assertIn("unavailable", err.getvalue())
+
+
+class MoveSignaturesMigrationTests(TransactionTestCase):
+    before, after = [('account', '0007_signature')], [('account', '0008_move_signatures_off_user')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_undecodable_base64_is_kept(self):
+        old_apps = self.migrate(self.before)
+        garbage = "data:image/png;base64,not*base64"
+        old_apps.get_model('account', 'User').objects.create(
+            email="old@example.com", phone="0911000001", signaturebase64=garbage, signaturejson=[[{'x': 1, 'y': 2}]],
+        )
+        new_apps = self.migrate(self.after)
+        signature = new_apps.get_model('account', 'Signature').objects.get(user__email="old@example.com")
+        self.assertEqual((bytes(signature.image), signature.content_type), (garbage.encode(), 'text/plain'))
+        self.assertIsNotNone(signature.strokes)
+
+        old_apps = self.migrate(self.before)
+        user = old_apps.get_model('account', 'User').objects.get(email="old@example.com")
+        self.assertEqual(user.signaturebase64, garbage)
+
+
+class BenchmarkHelperTests(TestCase):
+    def test_synthetic_signatures_preprocess(self):
+        signatures = synthetic_signatures(2, sizes=[(400, 200)], formats=['PNG', 'JPEG'])
+        self.assertEqual(sorted(signatures), [((400, 200), 'JPEG'), ((400, 200), 'PNG')])
+        decode, preprocess = preprocessing_samples(signatures[((400, 200), 'PNG')])
+        self.assertEqual((len(decode), len(preprocess)), (2, 2))
+
+    def test_summarize(self):
+        samples = time_calls(lambda: None, 5, warmup=2)
+        self.assertEqual(len(samples), 5)
+        summary = summarize([10.0] * 99 + [110.0], items_per_call=4)
+        self.assertEqual((summary['calls'], summary['p50_ms'], summary['mean_ms']), (100, 10.0, 11.0))
+        self.assertGreater(summary['p99_ms'], summary['p95_ms'])
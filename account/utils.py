@@ -1,36 +1,406 @@
-import tensorflow as tf
-import base64
+import hashlib
 import io
+import time
+import numpy as np
 from PIL import Image
-from sklearn.metrics.pairwise import cosine_similarity
-    
-model = tf.keras.applications.MobileNetV2(weights="imagenet", include_top=False)
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from . import model_registry, verification_stats
+from .batching import MicroBatcher
+from .embedding_cache import CACHE_COUNTERS, EmbeddingCache
+from .embedding_backends import EMBEDDING_BACKENDS, get_embedding_backend
+from .models import SignatureEmbedding
+from .preprocessing import (
+    PREPROCESSING_VERSION, InvalidSignature, PreparedSignature, decode_data_url, prepare_signature,
+    prepare_signature_bytes,
+)
+from .signature_storage import get_signature
+from .stroke_matching import stroke_distance
+from .verification_pool import PoolClient
+
+SIGNATURE_BATCHER = "mobilenetv2-batcher"
+SIGNATURE_POOL_CLIENT = "verification-pool-client"
+SIGNATURE_PCA = "signature-pca"
+SIGNATURE_EMBEDDING_CACHE = "signature-embedding-cache"
+EMBEDDING_MODES = ['flat', 'pooled']
+# Outcome counters kept for every call to match_signature.
+CASCADE_COUNTERS = ['total', 'stroke_accept', 'stroke_reject', 'stroke_ambiguous', 'stroke_missing', 'cnn_accept', 'cnn_reject']
+
+
+def _load_signature_batcher():
+    return MicroBatcher(
+        run_signature_model,
+        max_batch_size=settings.SIGNATURE_BATCH_MAX_SIZE,
+        max_wait_ms=settings.SIGNATURE_BATCH_MAX_WAIT_MS,
+    )
+
+
+def load_pca(path):
+    """Mean and component matrix written by the fit_signature_pca command."""
+    with np.load(path) as pca:
+        return {
+            'mean': pca['mean'].astype(np.float32),
+            'components': pca['components'].astype(np.float32),
+            'tag': str(pca['tag']),
+        }
+
+
+def _load_signature_pca():
+    return load_pca(settings.SIGNATURE_PCA_PATH)
+
+
+def _load_embedding_cache():
+    return EmbeddingCache(settings.SIGNATURE_EMBEDDING_CACHE_SIZE, settings.SIGNATURE_EMBEDDING_CACHE_TTL)
+
+
+def _load_pool_client():
+    return PoolClient(settings.SIGNATURE_POOL_ADDRESS, timeout=settings.SIGNATURE_POOL_TIMEOUT)
+
+
+model_registry.register(SIGNATURE_BATCHER, _load_signature_batcher)
+model_registry.register(SIGNATURE_POOL_CLIENT, _load_pool_client)
+model_registry.register(SIGNATURE_PCA, _load_signature_pca)
+model_registry.register(SIGNATURE_EMBEDDING_CACHE, _load_embedding_cache)
+
+
+def signature_model_version():
+    """Tag for stored embeddings; changes whenever the backend, reduction or preprocessing does."""
+    mode = settings.SIGNATURE_EMBEDDING_MODE
+    if mode == 'pooled' and settings.SIGNATURE_PCA_PATH:
+        mode = f"pooled-pca-{model_registry.get(SIGNATURE_PCA)['tag']}"
+    return f"{EMBEDDING_BACKENDS[settings.SIGNATURE_EMBEDDING_BACKEND].version}-{mode}-v{PREPROCESSING_VERSION}"
+
+
+def warmup_signature_model():
+    """
+    Load the model and run one forward pass so the first verification isn't
+    slow. Goes through the verification pool if one is configured, so it
+    raises SignatureVerificationUnavailable while the pool is down.
+    """
+    run_signature_model(np.zeros((1, 224, 224, 3), dtype=np.float32))
+    return get_embedding_backend()
+
 
 def decode_base64_to_image(base64_string):
-    img_data = base64.b64decode(base64_string.split(",")[1])
-    img = Image.open(io.BytesIO(img_data)).convert('RGB')
+    img = Image.open(io.BytesIO(decode_data_url(base64_string))).convert('RGB')
     return img
 
-# Decode base64 images
+
+def preprocess_signature(base64_string):
+    """Decode a data-URL signature into a MobileNetV2-ready (224, 224, 3) array."""
+    return prepare_signature(base64_string).tensor
+
+
+def project_features(features, mode=None, projection=None):
+    """
+    Reduce (n, 7, 7, 1280) feature maps to embedding rows: 'flat' keeps the
+    whole 62,720-d map, 'pooled' averages it over space to 1280-d and then
+    applies `projection` (default: the configured PCA, if any; False: none).
+    """
+    mode = mode or settings.SIGNATURE_EMBEDDING_MODE
+    if mode == 'flat':
+        return features.reshape(len(features), -1)
+    pooled = features.mean(axis=(1, 2))
+    if projection is None and settings.SIGNATURE_PCA_PATH:
+        projection = model_registry.get(SIGNATURE_PCA)
+    if projection:
+        pooled = (pooled - projection['mean']) @ projection['components'].T
+    return pooled.astype(np.float32)
+
+
+def embed_batch_locally(batch, backend=None):
+    """Run a (n, 224, 224, 3) batch through an in-process backend and return embedding rows."""
+    features = get_embedding_backend(backend).embed(np.asarray(batch, dtype=np.float32))
+    return project_features(features)
+
+
+def run_signature_model(batch):
+    """Embed a (n, 224, 224, 3) batch, in the verification pool if one is configured."""
+    batch = np.asarray(batch, dtype=np.float32)
+    if settings.SIGNATURE_POOL_ADDRESS:
+        return model_registry.get(SIGNATURE_POOL_CLIENT).embed(batch)
+    return embed_batch_locally(batch)
+
+
+def _embed_arrays(arrays):
+    if settings.SIGNATURE_BATCHING:
+        # Share a forward pass with whatever other requests are in flight.
+        batcher = model_registry.get(SIGNATURE_BATCHER)
+        futures = [batcher.submit(array) for array in arrays]
+        return np.stack([future.result() for future in futures])
+    return run_signature_model(np.stack(arrays))
+
+
+def embed_prepared(prepared, timings=None):
+    """
+    Return one float32 embedding row per PreparedSignature. Embeddings of
+    image bytes seen recently under the same model version come from the
+    probe cache instead of the model.
+    """
+    start = time.perf_counter()
+    if not settings.SIGNATURE_EMBEDDING_CACHE_SIZE:
+        embeddings = _embed_arrays([signature.tensor for signature in prepared])
+    else:
+        cache = model_registry.get(SIGNATURE_EMBEDDING_CACHE)
+        version = signature_model_version()
+        keys = [f"{hashlib.sha256(signature.data).hexdigest()}:{version}" for signature in prepared]
+        rows = [cache.get(key) for key in keys]
+        missing = [index for index, row in enumerate(rows) if row is None]
+        if missing:
+            computed = _embed_arrays([prepared[index].tensor for index in missing])
+            for index, row in zip(missing, computed):
+                cache.set(keys[index], row)
+                rows[index] = row
+        embeddings = np.stack(rows)
+    if timings is not None:
+        timings['inference'] = time.perf_counter() - start
+    return embeddings
+
+
+def embed_signatures(base64_strings):
+    """Return one float32 embedding row per data-URL signature."""
+    return embed_prepared([prepare_signature(value) for value in base64_strings])
+
+
+def cosine_similarity(emb1, emb2):
+    emb1 = emb1.ravel().astype(np.float32)
+    emb2 = emb2.ravel().astype(np.float32)
+    norms = np.linalg.norm(emb1) * np.linalg.norm(emb2)
+    if norms == 0:
+        return 0.0
+    return float(np.dot(emb1, emb2) / norms)
+
+
+def store_signature_embedding(user, embedding=None):
+    """Compute (unless given) and persist the enrolled template of the user's signature."""
+    signature = get_signature(user)
+    if embedding is None:
+        embedding = embed_prepared([prepare_signature_bytes(signature.image_bytes())])[0]
+    stored, _ = SignatureEmbedding.objects.update_or_create(
+        user=user,
+        source=SignatureEmbedding.ENROLLED,
+        defaults={
+            'model_version': signature_model_version(),
+            'signature_hash': signature.sha256,
+            'dtype': settings.SIGNATURE_EMBEDDING_DTYPE,
+            'vector': embedding.astype(settings.SIGNATURE_EMBEDDING_DTYPE).tobytes(),
+        }
+    )
+    return stored
+
+
+def get_reference_templates(user):
+    """
+    Return the user's current templates, enrolled first. The enrolled one is
+    recomputed if stale; check-in templates from another model version can't
+    be, so they are dropped.
+    """
+    version = signature_model_version()
+    templates = list(SignatureEmbedding.objects.filter(user=user).order_by('created_at'))
+    stale = [t.id for t in templates if t.source == SignatureEmbedding.CHECKIN and t.model_version != version]
+    if stale:
+        SignatureEmbedding.objects.filter(id__in=stale).delete()
+    enrolled = next((t for t in templates if t.source == SignatureEmbedding.ENROLLED), None)
+    if (
+        enrolled is None or
+        enrolled.model_version != version or
+        enrolled.signature_hash != get_signature(user).sha256
+    ):
+        enrolled = store_signature_embedding(user)
+    return [enrolled] + [
+        t for t in templates if t.source == SignatureEmbedding.CHECKIN and t.model_version == version
+    ]
+
+
+def get_reference_embedding(user):
+    """Return the enrolled embedding of the user's signature, refreshing it if stale."""
+    return get_reference_templates(user)[0].to_array()
+
+
+def template_scores(templates, embedding):
+    """Cosine similarity of one embedding against every template in a single matrix product."""
+    matrix = np.stack([template.to_array() for template in templates])
+    embedding = embedding.ravel().astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding)
+    return (matrix @ embedding) / np.maximum(norms, 1e-12)
+
+
+def score_signature(user, probe, timings=None):
+    """
+    Best similarity between a probe (data URL or PreparedSignature) and any
+    of the user's templates. Only the probe is embedded. Returns
+    (similarity, probe PreparedSignature, probe embedding, similarity to the
+    enrolled template).
+    """
+    if not isinstance(probe, PreparedSignature):
+        probe = prepare_signature(probe)
+    if timings is not None:
+        timings.update(probe.timings)
+    templates = get_reference_templates(user)
+    embedding = embed_prepared([probe], timings)[0]
+    start = time.perf_counter()
+    scores = template_scores(templates, embedding)
+    best = int(np.argmax(scores))
+    if timings is not None:
+        timings['similarity'] = time.perf_counter() - start
+    SignatureEmbedding.objects.filter(id=templates[best].id).update(last_matched_at=timezone.now())
+    return float(scores[best]), probe, embedding, float(scores[0])
+
+
+def verify_signature(user, probe, timings=None):
+    """
+    Similarity between a probe signature (data URL or PreparedSignature) and
+    the user's closest template. Stage durations are added to `timings` if given.
+    """
+    return score_signature(user, probe, timings)[0]
+
+
+def add_signature_template(user, prepared, embedding, similarity, enrolled_similarity):
+    """
+    Keep the embedding of a check-in the CNN accepted as another template,
+    evicting a check-in template per SIGNATURE_TEMPLATE_EVICTION once the
+    user has SIGNATURE_MAX_TEMPLATES. Only probes scoring at least
+    SIGNATURE_TEMPLATE_ADOPT_THRESHOLD against the enrolled template are
+    kept, so borderline accepts can't pull the templates away from it.
+    Returns the new template, or None if not kept.
+    """
+    if (
+        settings.SIGNATURE_MAX_TEMPLATES < 2 or
+        enrolled_similarity < settings.SIGNATURE_TEMPLATE_ADOPT_THRESHOLD or
+        similarity > settings.SIGNATURE_TEMPLATE_REDUNDANT_SCORE
+    ):
+        return None
+    checkins = SignatureEmbedding.objects.filter(user=user, source=SignatureEmbedding.CHECKIN)
+    excess = checkins.count() - (settings.SIGNATURE_MAX_TEMPLATES - 2)
+    if excess > 0:
+        if settings.SIGNATURE_TEMPLATE_EVICTION == 'lru':
+            order = [F('last_matched_at').asc(nulls_first=True), 'created_at']
+        else:
+            order = ['created_at']
+        evicted = checkins.order_by(*order).values_list('id', flat=True)[:excess]
+        SignatureEmbedding.objects.filter(id__in=list(evicted)).delete()
+    return SignatureEmbedding.objects.create(
+        user=user,
+        source=SignatureEmbedding.CHECKIN,
+        model_version=signature_model_version(),
+        signature_hash=hashlib.sha256(prepared.data).hexdigest(),
+        dtype=settings.SIGNATURE_EMBEDDING_DTYPE,
+        vector=embedding.astype(settings.SIGNATURE_EMBEDDING_DTYPE).tobytes(),
+        last_matched_at=timezone.now(),
+    )
+
+
+def _stroke_stage(user, probe_strokes, timings=None):
+    """Stroke cascade verdict as (matched, stage), or None when the CNN has to decide."""
+    if not settings.SIGNATURE_STROKE_CASCADE or probe_strokes is None:
+        verification_stats.record('stroke_missing')
+        return None
+    start = time.perf_counter()
+    distance = stroke_distance(get_signature(user).stroke_data(), probe_strokes)
+    if timings is not None:
+        timings['strokes'] = time.perf_counter() - start
+    if distance is not None and distance <= settings.SIGNATURE_STROKE_ACCEPT_DISTANCE:
+        verification_stats.record('stroke_accept')
+        return True, 'stroke_accept'
+    if distance is not None and distance >= settings.SIGNATURE_STROKE_REJECT_DISTANCE:
+        verification_stats.record('stroke_reject')
+        return False, 'stroke_reject'
+    verification_stats.record('stroke_missing' if distance is None else 'stroke_ambiguous')
+    return None
+
+
+def _cnn_stage(user, prepared, embedding, similarity, enrolled_similarity):
+    # The only place templates are adopted: stroke accepts never add one.
+    matched = similarity >= settings.SIGNATURE_THRESHOLD
+    stage = 'cnn_accept' if matched else 'cnn_reject'
+    verification_stats.record(stage)
+    if matched:
+        add_signature_template(user, prepared, embedding, similarity, enrolled_similarity)
+    return matched, stage
+
+
+def match_signature(user, probe, probe_strokes=None, timings=None):
+    """
+    Decide whether a probe signature matches the user's enrolled one. The
+    probe image is always decoded first, so an unreadable one raises
+    InvalidSignature whatever the strokes say. When both sides have stroke
+    data, a cheap DTW comparison settles clear matches and clear forgeries;
+    only the rest is passed to the CNN. Returns (matched, stage) where stage
+    names the step that decided.
+    """
+    verification_stats.record('total')
+    prepared = probe if isinstance(probe, PreparedSignature) else prepare_signature(probe)
+    if timings is not None:
+        timings.update(prepared.timings)
+    decided = _stroke_stage(user, probe_strokes, timings)
+    if decided is not None:
+        return decided
+    similarity, prepared, embedding, enrolled_similarity = score_signature(user, prepared, timings)
+    return _cnn_stage(user, prepared, embedding, similarity, enrolled_similarity)
+
+
+def _match_chunk(chunk, results, best_templates):
+    """Embed a chunk of (index, user, prepared) in one forward pass and settle each item with the CNN stage."""
+    embeddings = embed_prepared([prepared for _, _, prepared in chunk])
+    for (index, user, prepared), embedding in zip(chunk, embeddings):
+        templates = get_reference_templates(user)
+        scores = template_scores(templates, embedding)
+        best = int(np.argmax(scores))
+        best_templates.append(templates[best].id)
+        results[index] = _cnn_stage(user, prepared, embedding, float(scores[best]), float(scores[0]))
+
+
+def match_signatures(items):
+    """
+    match_signature for many (user, probe, probe_strokes) items at once, as
+    uploaded by offline kiosks. Probes the stroke stage can't settle are
+    embedded in SIGNATURE_BATCH_MAX_SIZE forward passes; each chunk is
+    prepared, embedded and scored before the next one is decoded, so only
+    one chunk of tensors is held at a time. Returns one (matched, stage) per
+    item; stage is 'invalid' for undecodable probes.
+    """
+    results = [None] * len(items)
+    pending, best_templates = [], []
+    for index, (user, probe, probe_strokes) in enumerate(items):
+        verification_stats.record('total')
+        try:
+            prepared = probe if isinstance(probe, PreparedSignature) else prepare_signature(probe)
+        except InvalidSignature:
+            results[index] = (False, 'invalid')
+            continue
+        results[index] = _stroke_stage(user, probe_strokes)
+        if results[index] is None:
+            pending.append((index, user, prepared))
+        if len(pending) == settings.SIGNATURE_BATCH_MAX_SIZE:
+            _match_chunk(pending, results, best_templates)
+            pending = []
+    if pending:
+        _match_chunk(pending, results, best_templates)
+    if best_templates:
+        SignatureEmbedding.objects.filter(id__in=best_templates).update(last_matched_at=timezone.now())
+    return results
+
+
+def signature_verification_stats():
+    """Cascade counters, the share of verifications each stage settled and probe cache counters."""
+    counts = verification_stats.counters(CASCADE_COUNTERS)
+    total = counts['total']
+    stroke_decided = counts['stroke_accept'] + counts['stroke_reject']
+    cnn = counts['cnn_accept'] + counts['cnn_reject']
+    cache = verification_stats.counters(CACHE_COUNTERS)
+    lookups = cache['cache_hit'] + cache['cache_miss']
+    return {
+        'counts': counts,
+        'stroke_hit_rate': stroke_decided / total if total else 0.0,
+        'cnn_rate': cnn / total if total else 0.0,
+        'embedding_cache': {
+            **cache,
+            'hit_rate': cache['cache_hit'] / lookups if lookups else 0.0,
+        },
+    }
+
+
 def calculate_signature_similarity(base64_img1, base64_img2):
-    img1 = decode_base64_to_image(base64_img1)
-    img2 = decode_base64_to_image(base64_img2)
-
-    # Resize to match MobileNetV2 expected input
-    img1 = img1.resize((224, 224))
-    img2 = img2.resize((224, 224))
-
-    # Convert to arrays
-    img1_array = tf.keras.preprocessing.image.img_to_array(img1)
-    img2_array = tf.keras.preprocessing.image.img_to_array(img2)
-
-    # Preprocess
-    img1_array = tf.keras.applications.mobilenet_v2.preprocess_input(img1_array)
-    img2_array = tf.keras.applications.mobilenet_v2.preprocess_input(img2_array)
-    # Get embeddings
-    emb1 = model.predict(img1_array[None, ...])
-    emb2 = model.predict(img2_array[None, ...])
-
-    # Calculate cosine similarity
-    similarity = cosine_similarity(emb1.flatten().reshape(1, -1), emb2.flatten().reshape(1, -1))
-    return similarity
+    emb1, emb2 = embed_signatures([base64_img1, base64_img2])
+    return cosine_similarity(emb1, emb2)
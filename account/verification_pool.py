@@ -0,0 +1,182 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import Client, Listener
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+
+class SignatureVerificationUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Signature verification is busy. Please try again."
+    default_code = 'signature_verification_unavailable'
+
+
+def parse_address(address):
+    """'host:port' becomes a TCP address, anything else is a unix socket path."""
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return (host, int(port))
+    return address
+
+
+def _authkey():
+    return settings.SECRET_KEY.encode()
+
+
+def _worker_main(index, tasks, results):
+    # Spawned interpreters start without Django configured.
+    import django
+    django.setup()
+    os.environ['SIGNATURE_WORKER_INDEX'] = str(index)
+    import numpy as np
+    from .utils import embed_batch_locally
+
+    embed_batch_locally(np.zeros((1, 224, 224, 3), dtype=np.float32))
+    while True:
+        task_id, batch = tasks.get()
+        try:
+            results.put((task_id, 'ok', embed_batch_locally(batch)))
+        except Exception as e:
+            results.put((task_id, 'error', str(e)))
+
+
+class VerificationPool:
+    """
+    Serves signature embeddings to web workers from a fixed set of model-holding
+    processes. Requests beyond `queue_size` outstanding batches are refused
+    straight away so callers can shed load instead of piling up.
+    """
+
+    def __init__(self, address, workers, queue_size, task_timeout):
+        self.address = parse_address(address)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.task_timeout = task_timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._ids = itertools.count()
+        self._pending = {}
+        self._processes = []
+
+    def serve_forever(self):
+        self._tasks = self._context.Queue(maxsize=self.queue_size)
+        self._results = self._context.Queue()
+        self._processes = [self._start_worker(index) for index in range(self.workers)]
+        threading.Thread(target=self._route_results, daemon=True).start()
+        threading.Thread(target=self._supervise, daemon=True).start()
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(self.address, authkey=_authkey()) as listener:
+            logger.info("Signature verification pool listening on %s with %s workers", self.address, self.workers)
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning("Rejected pool connection: %s", e)
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _start_worker(self, index):
+        process = self._context.Process(
+            target=_worker_main, args=(index, self._tasks, self._results), daemon=True
+        )
+        process.start()
+        return process
+
+    def _supervise(self):
+        while True:
+            time.sleep(1)
+            for index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.error("Signature worker %s exited with %s; restarting", index, process.exitcode)
+                    self._processes[index] = self._start_worker(index)
+
+    def _route_results(self):
+        while True:
+            task_id, outcome, payload = self._results.get()
+            future = self._pending.pop(task_id, None)
+            if future is not None:
+                future.set_result((outcome, payload))
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    batch = conn.recv()
+                except (EOFError, OSError):
+                    return
+                task_id = next(self._ids)
+                future = Future()
+                self._pending[task_id] = future
+                try:
+                    self._tasks.put_nowait((task_id, batch))
+                except queue.Full:
+                    self._pending.pop(task_id, None)
+                    reply = ('busy', None)
+                else:
+                    try:
+                        reply = future.result(timeout=self.task_timeout)
+                    except FutureTimeoutError:
+                        # Lost with a crashed worker, or the workers are far behind.
+                        self._pending.pop(task_id, None)
+                        reply = ('busy', None)
+                try:
+                    conn.send(reply)
+                except OSError:
+                    # The client gave up waiting and hung up.
+                    return
+
+
+class PoolClient:
+    """Sends batches to a VerificationPool, keeping one connection per thread."""
+
+    def __init__(self, address, timeout):
+        self.address = parse_address(address)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = Client(self.address, authkey=_authkey())
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def embed(self, batch):
+        try:
+            conn = self._connection()
+            conn.send(batch)
+            if not conn.poll(self.timeout):
+                # A late reply would be read by the next request, so start over.
+                self._reset()
+                raise SignatureVerificationUnavailable()
+            outcome, payload = conn.recv()
+        except (OSError, EOFError) as e:
+            self._reset()
+            logger.error("Signature verification pool unreachable: %s", e)
+            raise SignatureVerificationUnavailable()
+
+        if outcome == 'busy':
+            raise SignatureVerificationUnavailable()
+        if outcome == 'error':
+            raise RuntimeError(f"Signature verification pool failed: {payload}")
+        return payload
@@ -0,0 +1,26 @@
+from django.core.cache import cache
+
+PREFIX = "signature-stats"
+
+
+def record(counter, amount=1):
+    """
+    Bump a verification counter. Counters live in the Django cache, so they
+    are shared between workers when a shared cache backend is configured.
+    """
+    key = f"{PREFIX}:{counter}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.set(key, amount, timeout=None)
+
+
+def counters(names):
+    values = cache.get_many([f"{PREFIX}:{name}" for name in names])
+    return {name: values.get(f"{PREFIX}:{name}", 0) for name in names}
+
+
+def reset(names):
+    cache.delete_many([f"{PREFIX}:{name}" for name in names])
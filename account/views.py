@@ -1,16 +1,26 @@
+import logging
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
 from rest_framework import mixins, viewsets
 from rest_framework.response import Response
 from rest_framework import status
 from .models import User
+from .parsers import SignatureJSONParser
 from .serializers import UserCreateSerializer, UserSerializer  # Assuming UserCreateSerializer is the correct one to use
 from rest_framework.decorators import action
-from .utils import calculate_signature_similarity
+from rest_framework.parsers import FormParser, MultiPartParser
+from .preprocessing import InvalidSignature, server_timing
+from .signature_storage import get_signature, signature_etag, signature_thumbnail
+from .utils import match_signature, signature_verification_stats
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from .swagger_schema import (
-    create_schema, email_login_schema, phone_login_schema
+    create_schema, email_login_schema, phone_login_schema, signature_thumbnail_schema
 )
-from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
 
 class UserSimpleViewset(viewsets.GenericViewSet):
     queryset = User.objects.all()
@@ -19,9 +29,13 @@ class UserSimpleViewset(viewsets.GenericViewSet):
 class UserViewset(mixins.CreateModelMixin, viewsets.GenericViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    # JSON bodies are size-limited for signature uploads; form clients keep DRF's usual parsers.
+    parser_classes = [SignatureJSONParser, FormParser, MultiPartParser]
     def get_permissions(self):
         if self.action in ['create', 'email_login', 'phone_login']:
             return [AllowAny()]
+        if self.action == 'verification_stats':
+            return [IsAdminUser()]
         return [IsAuthenticated()]
 
     @create_schema
@@ -37,73 +51,101 @@ class UserViewset(mixins.CreateModelMixin, viewsets.GenericViewSet):
         print("errors", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    @email_login_schema
-    @action(detail=False, methods=['POST'])
-    def email_login(self, request, *args, **kwargs):
-        """Login using email and signature verification."""
-        email = request.data.get('email')
+    def login_with_signature(self, request, user):
+        """Issue tokens for `user` if the submitted signature matches the enrolled one."""
         signature_base64 = request.data.get('signature_base64')
-        
-        # Retrieve the user by email
-        user = User.objects.filter(email=email).first()
-        if user is None:
-            return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
         # Check the signature similarity
-        base64_existing_signature = user.signaturebase64
-        if signature_base64 and base64_existing_signature:
-            similarity = calculate_signature_similarity(signature_base64, base64_existing_signature)
-            print("Signature similarity:", similarity)
+        if signature_base64 and get_signature(user) is not None:
+            timings = {}
+            try:
+                matched, stage = match_signature(
+                    user, signature_base64, request.data.get('signature_stroke'), timings=timings
+                )
+            except InvalidSignature:
+                return Response({"error": "Signature missing or invalid."}, status=status.HTTP_400_BAD_REQUEST)
+            logger.info("Signature of %s decided by %s", user.id, stage)
 
-            # If similarity is greater than 50%, authenticate user and issue tokens
-            if similarity >= settings.SIGNATURE_THRESHOLD:
+            # If the signature matches, authenticate user and issue tokens
+            if matched:
                 # Generate access and refresh tokens
                 refresh = RefreshToken.for_user(user)
                 access_token = str(refresh.access_token)
 
-                return Response({
+                response = Response({
                     "user": UserSerializer(user).data,
                     "access_token": access_token,
                     "refresh_token": str(refresh),
                 }, status=status.HTTP_200_OK)
+            else:
+                response = Response({
+                    "error": "Signature mismatch. Please try again!"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            response['Server-Timing'] = server_timing(timings)
+            return response
 
-            return Response({
-                "error": "Signature mismatch. Please try again!"
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
         return Response({"error": "Signature missing or invalid."}, status=status.HTTP_400_BAD_REQUEST)
+
+    @email_login_schema
+    @action(detail=False, methods=['POST'])
+    def email_login(self, request, *args, **kwargs):
+        """Login using email and signature verification."""
+        email = request.data.get('email')
+        
+        # Retrieve the user by email
+        user = User.objects.with_signature().filter(email=email).first()
+        if user is None:
+            return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        return self.login_with_signature(request, user)
     
     @phone_login_schema
     @action(detail=False, methods=['POST'])
     def phone_login(self, request, *args, **kwargs):
         """Login using phone number and signature verification."""
         phone = request.data.get('phone')
-        signature_base64 = request.data.get('signature_base64')
         
         # Retrieve the user by phone number
-        user = User.objects.filter(phone=phone).first()
+        user = User.objects.with_signature().filter(phone=phone).first()
         if user is None:
             return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Check the signature similarity
-        base64_existing_signature = user.signaturebase64
-        if signature_base64 and base64_existing_signature:
-            similarity = calculate_signature_similarity(signature_base64, base64_existing_signature)
-            print("Signature similarity:", similarity)
+        return self.login_with_signature(request, user)
 
-            # If similarity is greater than 50%, authenticate user and issue tokens
-            if similarity >= settings.SIGNATURE_THRESHOLD:
-                refresh = RefreshToken.for_user(user)
-                access_token = str(refresh.access_token)
+    @action(detail=False, methods=['GET'])
+    def verification_stats(self, request, *args, **kwargs):
+        """Signature verification cascade and probe cache counters (staff only)."""
+        return Response(signature_verification_stats(), status=status.HTTP_200_OK)
 
-                return Response({
-                    "user": UserSerializer(user).data,
-                    "access_token": access_token,
-                    "refresh_token": str(refresh),
-                }, status=status.HTTP_200_OK)
+    @signature_thumbnail_schema
+    @action(detail=False, methods=['GET'])
+    def signature(self, request, *args, **kwargs):
+        """PNG thumbnail of the caller's enrolled signature (staff may pass ?user=<id>), with ETag revalidation."""
+        user = request.user
+        if request.query_params.get('user') and request.query_params['user'] != str(user.id):
+            if not user.is_staff:
+                return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+            try:
+                user = User.objects.filter(id=request.query_params['user']).first()
+            except ValidationError:
+                user = None
+        try:
+            size = min(int(request.query_params.get('size', 128)), settings.SIGNATURE_THUMBNAIL_MAX_SIZE)
+        except ValueError:
+            return Response({"error": "size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if size < 1:
+            return Response({"error": "size must be positive."}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({
-                "error": "Signature mismatch. Please try again!"
-            }, status=status.HTTP_400_BAD_REQUEST)
+        signature = get_signature(user) if user is not None else None
+        if signature is None:
+            return Response({"detail": "Signature not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response({"error": "Signature missing or invalid."}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        etag = signature_etag(signature, size)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(signature_thumbnail(signature, size), content_type='image/png')
+        response['ETag'] = etag
+        # Stored by clients but revalidated each time, since the URL outlives a re-enrolment
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -133,4 +133,131 @@ SPECTACULAR_SETTINGS = {
 }
 
 CSRF_TRUSTED_ORIGINS = os.environ.get('CSRF_TRUSTED_ORIGINS', '').split(',')
-SIGNATURE_THRESHOLD = float(os.environ.get('SIGNATURE_THRESHOLD', 0.5))
\ No newline at end of file
+SIGNATURE_THRESHOLD = float(os.environ.get('SIGNATURE_THRESHOLD', 0.5))
+# Load the signature model when the process boots instead of on first use.
+SIGNATURE_MODEL_WARMUP = os.environ.get('SIGNATURE_MODEL_WARMUP', 'false') == 'true'
+
+# Coalesce concurrent signature embeddings into one forward pass. Only useful
+# with threaded workers, where several requests wait on the model at once.
+SIGNATURE_BATCHING = os.environ.get('SIGNATURE_BATCHING', 'false') == 'true'
+SIGNATURE_BATCH_MAX_SIZE = int(os.environ.get('SIGNATURE_BATCH_MAX_SIZE', 32))
+SIGNATURE_BATCH_MAX_WAIT_MS = float(os.environ.get('SIGNATURE_BATCH_MAX_WAIT_MS', 5))
+
+# How the signature model is invoked: 'function' (traced tf.function),
+# 'call' (direct eager model call) or 'predict' (Keras predict loop).
+SIGNATURE_INFERENCE_MODE = os.environ.get('SIGNATURE_INFERENCE_MODE', 'function')
+if SIGNATURE_INFERENCE_MODE not in ['predict', 'call', 'function']:
+    raise ValueError(f"Invalid SIGNATURE_INFERENCE_MODE value: {SIGNATURE_INFERENCE_MODE}. Valid options are: predict, call, function")
+
+# Which engine embeds signatures: 'keras', 'tflite_float16' or 'tflite_int8'.
+# The TFLite models are produced by `python manage.py convert_signature_models`.
+SIGNATURE_EMBEDDING_BACKEND = os.environ.get('SIGNATURE_EMBEDDING_BACKEND', 'keras')
+if SIGNATURE_EMBEDDING_BACKEND not in ['keras', 'tflite_float16', 'tflite_int8']:
+    raise ValueError(f"Invalid SIGNATURE_EMBEDDING_BACKEND value: {SIGNATURE_EMBEDDING_BACKEND}. Valid options are: keras, tflite_float16, tflite_int8")
+SIGNATURE_MODEL_DIR = os.environ.get('SIGNATURE_MODEL_DIR', os.path.join(BASE_DIR, 'signature_models'))
+
+# Address ('/path/to.sock' or 'host:port') of a shared signature verification
+# pool started with `python manage.py run_signature_pool`. When set, web
+# workers send images there instead of loading the model themselves.
+SIGNATURE_POOL_ADDRESS = os.environ.get('SIGNATURE_POOL_ADDRESS', '')
+SIGNATURE_POOL_WORKERS = int(os.environ.get('SIGNATURE_POOL_WORKERS', 2))
+SIGNATURE_POOL_QUEUE_SIZE = int(os.environ.get('SIGNATURE_POOL_QUEUE_SIZE', 64))
+SIGNATURE_POOL_TIMEOUT = float(os.environ.get('SIGNATURE_POOL_TIMEOUT', 10))
+
+# 'flat' compares the full 7x7x1280 MobileNetV2 feature map; 'pooled' compares
+# a 1280-d global average (optionally PCA-reduced with SIGNATURE_PCA_PATH, see
+# `python manage.py fit_signature_pca`). Scores differ between modes, so run
+# `python manage.py recalibrate_signature_threshold` before switching.
+SIGNATURE_EMBEDDING_MODE = os.environ.get('SIGNATURE_EMBEDDING_MODE', 'flat')
+if SIGNATURE_EMBEDDING_MODE not in ['flat', 'pooled']:
+    raise ValueError(f"Invalid SIGNATURE_EMBEDDING_MODE value: {SIGNATURE_EMBEDDING_MODE}. Valid options are: flat, pooled")
+SIGNATURE_PCA_PATH = os.environ.get('SIGNATURE_PCA_PATH', '')
+# Storage precision of persisted embeddings: 'float32' or 'float16'.
+SIGNATURE_EMBEDDING_DTYPE = os.environ.get('SIGNATURE_EMBEDDING_DTYPE', 'float32')
+if SIGNATURE_EMBEDDING_DTYPE not in ['float32', 'float16']:
+    raise ValueError(f"Invalid SIGNATURE_EMBEDDING_DTYPE value: {SIGNATURE_EMBEDDING_DTYPE}. Valid options are: float32, float16")
+
+# Compare stroke data (when the client sends `signature_stroke`) with DTW
+# before running the CNN. Distances at or below the accept bound pass and at
+# or above the reject bound fail outright; anything between goes to the CNN.
+# The probe image is decoded and checked either way. The bounds come from
+# account/stroke_calibration.json (`python manage.py calibrate_stroke_cascade`);
+# recalibrate on your own enrolled strokes before turning the cascade on.
+SIGNATURE_STROKE_CASCADE = os.environ.get('SIGNATURE_STROKE_CASCADE', 'false') == 'true'
+SIGNATURE_STROKE_ACCEPT_DISTANCE = float(os.environ.get('SIGNATURE_STROKE_ACCEPT_DISTANCE', 0.0296))
+SIGNATURE_STROKE_REJECT_DISTANCE = float(os.environ.get('SIGNATURE_STROKE_REJECT_DISTANCE', 0.1305))
+if SIGNATURE_STROKE_ACCEPT_DISTANCE >= SIGNATURE_STROKE_REJECT_DISTANCE:
+    raise ValueError("SIGNATURE_STROKE_ACCEPT_DISTANCE must be lower than SIGNATURE_STROKE_REJECT_DISTANCE")
+
+# Reference templates kept per user: the enrolled signature plus embeddings of
+# successful check-ins. Probes are scored against all of them at once and the
+# best score counts. When full, 'lru' drops the check-in template that matched
+# least recently and 'fifo' the oldest one; the enrolled template is kept.
+SIGNATURE_MAX_TEMPLATES = int(os.environ.get('SIGNATURE_MAX_TEMPLATES', 5))
+if SIGNATURE_MAX_TEMPLATES < 1:
+    raise ValueError(f"Invalid SIGNATURE_MAX_TEMPLATES value: {SIGNATURE_MAX_TEMPLATES}. Must be at least 1")
+SIGNATURE_TEMPLATE_EVICTION = os.environ.get('SIGNATURE_TEMPLATE_EVICTION', 'lru')
+if SIGNATURE_TEMPLATE_EVICTION not in ['lru', 'fifo']:
+    raise ValueError(f"Invalid SIGNATURE_TEMPLATE_EVICTION value: {SIGNATURE_TEMPLATE_EVICTION}. Valid options are: lru, fifo")
+# Check-ins scoring above this against an existing template add nothing new
+# and are not kept.
+SIGNATURE_TEMPLATE_REDUNDANT_SCORE = float(os.environ.get('SIGNATURE_TEMPLATE_REDUNDANT_SCORE', 0.95))
+# Accepted check-ins only become templates when they score at least this
+# against the enrolled template. Keep it above SIGNATURE_THRESHOLD so
+# near-threshold accepts, e.g. repeated forgery attempts, are never adopted.
+SIGNATURE_TEMPLATE_ADOPT_THRESHOLD = float(os.environ.get('SIGNATURE_TEMPLATE_ADOPT_THRESHOLD', 0.75))
+if not SIGNATURE_THRESHOLD < SIGNATURE_TEMPLATE_ADOPT_THRESHOLD < SIGNATURE_TEMPLATE_REDUNDANT_SCORE:
+    raise ValueError("SIGNATURE_TEMPLATE_ADOPT_THRESHOLD must be above SIGNATURE_THRESHOLD and below SIGNATURE_TEMPLATE_REDUNDANT_SCORE")
+
+# Per-process LRU of probe embeddings keyed by the decoded image bytes and the
+# model version, so retried check-ins skip inference. 0 disables it.
+SIGNATURE_EMBEDDING_CACHE_SIZE = int(os.environ.get('SIGNATURE_EMBEDDING_CACHE_SIZE', 256))
+SIGNATURE_EMBEDDING_CACHE_TTL = float(os.environ.get('SIGNATURE_EMBEDDING_CACHE_TTL', 300))
+
+# Record check-ins straight away as pending and verify their signatures in
+# `python manage.py process_attendance_verifications` instead of in the request.
+SIGNATURE_ASYNC_ATTENDANCE = os.environ.get('SIGNATURE_ASYNC_ATTENDANCE', 'false') == 'true'
+SIGNATURE_VERIFICATION_MAX_ATTEMPTS = int(os.environ.get('SIGNATURE_VERIFICATION_MAX_ATTEMPTS', 3))
+# Seconds after which a check-in claimed by a worker that never settled it
+# (e.g. because it crashed) is handed to another worker.
+SIGNATURE_VERIFICATION_CLAIM_TIMEOUT = int(os.environ.get('SIGNATURE_VERIFICATION_CLAIM_TIMEOUT', 300))
+
+# TensorFlow thread pools per process; 0 leaves TensorFlow's default of one
+# thread per core, which oversubscribes the host when several workers run.
+SIGNATURE_TF_INTRA_OP_THREADS = int(os.environ.get('SIGNATURE_TF_INTRA_OP_THREADS', 0))
+SIGNATURE_TF_INTER_OP_THREADS = int(os.environ.get('SIGNATURE_TF_INTER_OP_THREADS', 0))
+# Pin each worker that has a SIGNATURE_WORKER_INDEX (set automatically for
+# verification pool workers) to its own SIGNATURE_TF_INTRA_OP_THREADS cores.
+# `python manage.py benchmark_signature_threads` finds a good split.
+SIGNATURE_CPU_PINNING = os.environ.get('SIGNATURE_CPU_PINNING', 'false') == 'true'
+if SIGNATURE_CPU_PINNING and SIGNATURE_TF_INTRA_OP_THREADS < 1:
+    raise ValueError("SIGNATURE_CPU_PINNING needs SIGNATURE_TF_INTRA_OP_THREADS to be set")
+
+# Encoding of stored enrolled signatures: 'png' (greyscale) or 'webp' (lossless).
+SIGNATURE_STORAGE_FORMAT = os.environ.get('SIGNATURE_STORAGE_FORMAT', 'png')
+if SIGNATURE_STORAGE_FORMAT not in ['png', 'webp']:
+    raise ValueError(f"Invalid SIGNATURE_STORAGE_FORMAT value: {SIGNATURE_STORAGE_FORMAT}. Valid options are: png, webp")
+
+# Largest edge (px) of signature thumbnails served by users/signature/.
+SIGNATURE_THUMBNAIL_MAX_SIZE = int(os.environ.get('SIGNATURE_THUMBNAIL_MAX_SIZE', 512))
+
+# Limits on signature uploads (registration, login and check-in), checked
+# before anything is decoded: the whole JSON body, the decoded image, and the
+# image's pixel count as read from its header.
+SIGNATURE_MAX_UPLOAD_BYTES = int(os.environ.get('SIGNATURE_MAX_UPLOAD_BYTES', 2 * 1024 * 1024))
+SIGNATURE_MAX_IMAGE_BYTES = int(os.environ.get('SIGNATURE_MAX_IMAGE_BYTES', 1024 * 1024))
+SIGNATURE_MAX_PIXELS = int(os.environ.get('SIGNATURE_MAX_PIXELS', 12_000_000))
+
+# Offline kiosk uploads to events/<id>/attendance/bulk/: records per request
+# and the size of the whole JSON body.
+SIGNATURE_BULK_MAX_RECORDS = int(os.environ.get('SIGNATURE_BULK_MAX_RECORDS', 500))
+SIGNATURE_BULK_MAX_UPLOAD_BYTES = int(os.environ.get('SIGNATURE_BULK_MAX_UPLOAD_BYTES', 64 * 1024 * 1024))
+if SIGNATURE_BULK_MAX_RECORDS < 1:
+    raise ValueError("SIGNATURE_BULK_MAX_RECORDS must be at least 1")
+
+# How long a response sent with an Idempotency-Key header is replayed to
+# retries of the same request.
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+# Rows fetched per round trip by the streaming attendance exports.
+ATTENDANCE_EXPORT_CHUNK_SIZE = int(os.environ.get('ATTENDANCE_EXPORT_CHUNK_SIZE', 2000))
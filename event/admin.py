@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import Event, Attendance
+from .models import Event, Attendance, AttendanceVerification, IdempotencyKey
 
 # Register your models here.
 admin.site.register(Event)
 admin.site.register(Attendance)
+admin.site.register(AttendanceVerification)
+admin.site.register(IdempotencyKey)
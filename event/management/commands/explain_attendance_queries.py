@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+from account.models import User
+from event.models import Attendance, Event
+from event.query_plans import PLAN_VENDORS, attendance_access, seed_attendances
+
+
+class Command(BaseCommand):
+    help = (
+        "Call the attendance endpoints, EXPLAIN every query they make against the attendance table and fail "
+        "unless each one reads it with an index range or index-only scan. --seed first inserts that many "
+        "synthetic attendances; use it on a scratch database only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Attendances to insert first, e.g. 1000000.")
+        parser.add_argument('--events', type=int, default=100, help="Events the seeded attendances are spread over.")
+        parser.add_argument('--email', help="Attendee to call the endpoints as. Default: a seeded or existing one.")
+        parser.add_argument('--event', help="Event whose attendee list is checked. Default: a seeded or existing one.")
+
+    def client_for(self, user):
+        token = str(RefreshToken.for_user(user).access_token)
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost')
+        return Client(HTTP_AUTHORIZATION=f"Bearer {token}", HTTP_HOST=host)
+
+    def handle(self, *args, **options):
+        if connection.vendor not in PLAN_VENDORS:
+            self.stdout.write(self.style.WARNING(f"plan check unsupported on {connection.vendor}"))
+            return
+        attendee = event = None
+        if options['seed']:
+            self.stdout.write(f"Seeding {options['seed']} attendances over {options['events']} events...")
+            attendee, event = seed_attendances(options['seed'], events=options['events'])
+        if options['email']:
+            attendee = User.objects.filter(email=options['email']).first()
+        if options['event']:
+            event = Event.objects.filter(id=options['event']).first()
+        sample = Attendance.objects.select_related('attendee', 'event').first()
+        attendee = attendee or (sample and sample.attendee)
+        event = event or (sample and sample.event)
+        if attendee is None or event is None:
+            raise CommandError("No attendances to check; pass --seed.")
+
+        staff = event.program.organization.created_by
+        prefix = '/digital_attendance/api/event'
+        checks = [
+            (staff, f"{prefix}/events/{event.id}/attendance/"),
+            (attendee, f"{prefix}/attendance/my_attendances/"),
+            (attendee, f"{prefix}/attendance/my_attended_programs/"),
+            (attendee, f"{prefix}/attendance/my_attended_organizations/"),
+        ]
+        table = Attendance._meta.db_table
+        failures = []
+        for user, path in checks:
+            # Seeding can fill the query log, which would leave nothing new to capture.
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client_for(user).get(path)
+            self.stdout.write(f"{path} ({response.status_code})")
+            explained = [query['sql'] for query in queries if table in query['sql']]
+            if response.status_code != 200 or not explained:
+                failures.append(path)
+            for sql in explained:
+                access = attendance_access(sql)
+                if not access:
+                    access = [('full', "no recognisable access to the table")]
+                for kind, detail in access:
+                    self.stdout.write(f"  {'ok  ' if kind == 'index' else 'FULL'} {detail}")
+                if any(kind != 'index' for kind, _ in access):
+                    failures.append(path)
+
+        if failures:
+            raise CommandError(f"Failed, or read attendance without an index range: {', '.join(sorted(set(failures)))}")
+        self.stdout.write(self.style.SUCCESS("Every attendance query uses an index range or index-only scan."))
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from account.utils import warmup_signature_model
+from account.verification_pool import SignatureVerificationUnavailable
+from event.utils import process_pending_verifications
+
+
+class Command(BaseCommand):
+    help = "Verify the signatures of pending check-ins recorded with SIGNATURE_ASYNC_ATTENDANCE."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=16, help="Check-ins claimed per round.")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        try:
+            warmup_signature_model()
+        except SignatureVerificationUnavailable:
+            # Check-ins are released back to the queue until the pool is up.
+            self.stderr.write("Signature verification pool unavailable; skipping warmup.")
+        total = 0
+        while True:
+            settled = process_pending_verifications(options['batch_size'])
+            total += settled
+            if settled:
+                self.stdout.write(f"Settled {settled} check-ins ({total} total).")
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f"Settled {total} check-ins."))
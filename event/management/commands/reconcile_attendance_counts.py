@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from event.models import Event
+from event.utils import reconcile_attendance_counts
+
+
+class Command(BaseCommand):
+    help = "Recount attendances per event and repair the attendance counters that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', action='append', dest='events', help="Only this event id (repeatable).")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it.")
+
+    def handle(self, *args, **options):
+        events = Event.objects.filter(id__in=options['events']) if options['events'] else None
+        repaired = reconcile_attendance_counts(events, dry_run=options['dry_run'])
+        for event, counted, counted_valid in repaired:
+            self.stdout.write(
+                f"{event.id} {event.title}: {event.attendance_count}/{event.valid_attendance_count} "
+                f"-> {counted}/{counted_valid} (attendances/valid)"
+            )
+        verb = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(repaired)} events with drifted counters."))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.17 on 2026-10-18 12:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0005_alter_attendance_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='verification_status',
+            field=models.CharField(choices=[('verified', 'Verified'), ('pending', 'Pending'), ('rejected', 'Rejected'), ('failed', 'Failed')], default='verified', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='AttendanceVerification',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False)),
+                ('signature_base64', models.TextField()),
+                ('signature_stroke', models.JSONField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attendance', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_verification', to='event.attendance')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def remove_duplicate_attendances(apps, schema_editor):
+    """Keep one attendance per (event, attendee): a valid one if any, else the earliest."""
+    Attendance = apps.get_model('event', 'Attendance')
+    previous = None
+    duplicates = []
+    rows = Attendance.objects.order_by('event_id', 'attendee_id', '-valid', 'created_at').values_list(
+        'id', 'event_id', 'attendee_id'
+    )
+    for attendance_id, event_id, attendee_id in rows.iterator():
+        if (event_id, attendee_id) == previous:
+            duplicates.append(attendance_id)
+        previous = (event_id, attendee_id)
+    for start in range(0, len(duplicates), 500):
+        Attendance.objects.filter(id__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0006_attendance_verification'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-18 13:03
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_attendances(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    Attendance = apps.get_model('event', 'Attendance')
+
+    def counted(**filters):
+        rows = (
+            Attendance.objects.filter(event=OuterRef('pk'), **filters)
+            .order_by().values('event').annotate(n=Count('pk')).values('n')
+        )
+        return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+    Event.objects.update(attendance_count=counted(), valid_attendance_count=counted(valid=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0008_attendance_unique_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='attendance_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='valid_attendance_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_attendances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.17 on 2026-10-18 13:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('event', '0009_event_attendance_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['event', '-created_at'], name='attendance_event_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['event', 'valid', '-created_at'], name='attendance_event_valid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['attendee', '-created_at'], name='attendance_attendee_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('valid', True)), fields=['attendee', 'event'], name='attendance_valid_attended_idx'),
+        ),
+        migrations.AlterField(
+            model_name='attendance',
+            name='attendee',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attended_events', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='attendance',
+            name='event',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='event.event'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0010_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_event_recent_idx',
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['event', '-created_at', '-id'], name='attendance_event_recent_idx'),
+        ),
+    ]
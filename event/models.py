@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 import uuid
 import string
@@ -21,10 +22,17 @@ class Event(models.Model):
     archived_at = models.DateTimeField(null=True, blank=True)
     concluded_at = models.DateTimeField(null=True, blank=True)
     reactivated_at = models.DateTimeField(null=True, blank=True)
+    # Kept in step with the event's Attendance rows; reconcile_attendance_counts repairs drift.
+    attendance_count = models.PositiveIntegerField(default=0, editable=False)
+    valid_attendance_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.title} by Program: {self.program.name}"
 
+    @property
+    def invalid_attendance_count(self):
+        return self.attendance_count - self.valid_attendance_count
+
     def save(self, *args, **kwargs):
         if not self.short_code:
             self.short_code = self._generate_unique_short_code()
@@ -38,11 +46,24 @@ class Event(models.Model):
                 return code
 
 class Attendance(models.Model):
+    VERIFIED = 'verified'
+    PENDING = 'pending'
+    REJECTED = 'rejected'
+    FAILED = 'failed'
+    VERIFICATION_STATUS_CHOICES = [
+        (VERIFIED, 'Verified'),
+        (PENDING, 'Pending'),
+        (REJECTED, 'Rejected'),
+        (FAILED, 'Failed'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4)
-    event = models.ForeignKey('event.Event', on_delete=models.CASCADE)
-    attendee = models.ForeignKey('account.User', on_delete=models.CASCADE, related_name='attended_events')
+    # The unique constraint and the indexes below lead with these, so they need no index of their own.
+    event = models.ForeignKey('event.Event', on_delete=models.CASCADE, db_index=False)
+    attendee = models.ForeignKey('account.User', on_delete=models.CASCADE, related_name='attended_events', db_index=False)
     display_name = models.CharField(max_length=255, null=True, blank=True)
     valid = models.BooleanField(default=False)
+    verification_status = models.CharField(max_length=16, choices=VERIFICATION_STATUS_CHOICES, default=VERIFIED)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     validated_at = models.DateTimeField(null=True, blank=True)
@@ -50,5 +71,52 @@ class Attendance(models.Model):
     validated_by = models.ForeignKey('account.User', on_delete=models.CASCADE, null=True, blank=True, related_name='validated_attendances')
     invalidated_by = models.ForeignKey('account.User', on_delete=models.CASCADE, null=True, blank=True, related_name='invalidated_attendances')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'attendee'], name='unique_event_attendee'),
+        ]
+        indexes = [
+            # Event attendee lists, newest first (also the cursor pagination order), and their valid/invalid splits.
+            models.Index(fields=['event', '-created_at', '-id'], name='attendance_event_recent_idx'),
+            models.Index(fields=['event', 'valid', '-created_at'], name='attendance_event_valid_idx'),
+            # my_attendances.
+            models.Index(fields=['attendee', '-created_at'], name='attendance_attendee_recent_idx'),
+            # The valid=True joins of my_attended_programs/organizations, answered from the index alone.
+            models.Index(fields=['attendee', 'event'], condition=models.Q(valid=True), name='attendance_valid_attended_idx'),
+        ]
+
     def __str__(self):
         return f"{self.attendee.name} Attendance for Event: {self.event.title}, Program: {self.event.program.name}"
+
+class AttendanceVerification(models.Model):
+    """A check-in signature waiting for the verification worker; deleted once processed."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    attendance = models.OneToOneField('event.Attendance', on_delete=models.CASCADE, related_name='pending_verification')
+    signature_base64 = models.TextField()
+    signature_stroke = models.JSONField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    # Set while a worker is verifying the signature.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pending verification of {self.attendance_id}"
+
+class IdempotencyKey(models.Model):
+    """The response to a request sent with an Idempotency-Key header, replayed when the request is retried."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    user = models.ForeignKey('account.User', on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_user_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} of {self.user_id}"
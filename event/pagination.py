@@ -1,6 +1,35 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 10 
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class OptionalCursorPagination(CustomPageNumberPagination):
+    """
+    Page numbers by default; `?paginate=cursor` (or following a `next` link
+    with a `cursor`) switches to keyset pagination, whose pages cost the
+    same at any depth and carry no total count. The keyset order is the
+    view's `cursor_ordering`, which should match an index.
+    """
+    cursor_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if request.query_params.get('paginate') == 'cursor' or 'cursor' in request.query_params:
+            self.cursor_pagination = self.cursor_pagination_class()
+            self.cursor_pagination.ordering = view.cursor_ordering
+            return self.cursor_pagination.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -86,6 +86,22 @@ class NestedEventViewSetPermissions(BasePermission):
                 ).exists()
             )
 
+        if action == 'export_attendance':
+            return user.is_authenticated and (
+                user.is_staff or
+                organization.created_by == user or
+                OrganizationAdmin.objects.filter(
+                    user=user,
+                    organization=organization,
+                    is_active=True
+                ).exists() or
+                ProgramEventAdmin.objects.filter(
+                    user=user,
+                    program=program,
+                    is_active=True
+                ).exists()
+            )
+
 
         # All other actions require authentication
         if not user or not user.is_authenticated:
@@ -105,7 +121,7 @@ class AttendanceViewSetPermissions(BasePermission):
         user = request.user
         action = view.action
 
-        if action == 'update_display_name':
+        if action in ['update_display_name', 'verification_status']:
             return obj.attendee == user
 
         if action in ['invalidate_attendance', 'revalidate_attendance']:
@@ -143,7 +159,8 @@ class NestedAttendanceViewSetPermissions(BasePermission):
         program = event.program
         organization = program.organization
 
-        if action == 'list':
+        # Listing, exporting and uploading kiosk batches are for event staff.
+        if action in ['list', 'export', 'bulk']:
             return (
                 user.is_staff or
                 organization.created_by == user or
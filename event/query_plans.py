@@ -0,0 +1,118 @@
+import json
+import re
+from django.db import connection
+from account.models import User
+from organization.models import Organization
+from program.models import Program
+from .models import Attendance, Event
+
+SEED_DOMAIN = 'query-plans.invalid'
+# Backends whose query plans table_access can read.
+PLAN_VENDORS = ('postgresql', 'sqlite')
+
+
+def seed_attendances(count, events=100, organizations=10, batch_size=10_000):
+    """
+    Bulk-insert `count` attendances spread over `events` events (every seeded
+    user attends each of them) for query plan checks. Seeded users have
+    emails @SEED_DOMAIN. Returns (first seeded user, first seeded event).
+    """
+    offset = User.objects.filter(email__endswith=f"@{SEED_DOMAIN}").count()
+    user_count = -(-count // events)
+    seeded = []
+    for start in range(0, user_count, batch_size):
+        users = [
+            User(email=f"seed-{offset + i}@{SEED_DOMAIN}", phone=f"seed{offset + i}", name=f"Seed {offset + i}", password='!')
+            for i in range(start, min(start + batch_size, user_count))
+        ]
+        User.objects.bulk_create(users)
+        seeded.extend(user.id for user in users)
+    owner = User.objects.get(id=seeded[0])
+
+    event_ids = []
+    for index in range(events):
+        if index % max(1, events // organizations) == 0:
+            organization = Organization.objects.create(
+                code=f"seed-{offset}-{index}", name=f"Seed organization {index}", created_by=owner
+            )
+            program = Program.objects.create(name=f"Seed program {index}", organization=organization, created_by=owner)
+        event_ids.append(Event.objects.create(
+            title=f"Seed event {index}", description="Seeded for query plan checks", program=program, created_by=owner
+        ).id)
+
+    batch = []
+    totals = {event_id: [0, 0] for event_id in event_ids}
+    for i in range(count):
+        attendance = Attendance(
+            event_id=event_ids[i % events],
+            attendee_id=seeded[i // events],
+            # Every tenth user's check-ins were invalidated.
+            valid=(i // events) % 10 != 0,
+        )
+        totals[attendance.event_id][0] += 1
+        totals[attendance.event_id][1] += attendance.valid
+        batch.append(attendance)
+        if len(batch) == batch_size:
+            Attendance.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Attendance.objects.bulk_create(batch)
+    for event_id, (total, valid) in totals.items():
+        Event.objects.filter(id=event_id).update(attendance_count=total, valid_attendance_count=valid)
+    with connection.cursor() as cursor:
+        # Fresh statistics, or the planner judges the new indexes on an empty table.
+        cursor.execute('ANALYZE')
+    return owner, Event.objects.get(id=event_ids[0])
+
+
+def _postgresql_access(node, table):
+    access = []
+    relation = node.get('Relation Name')
+    kind = node['Node Type']
+    if relation == table and kind == 'Seq Scan':
+        access.append(('full', f"Seq Scan on {table}"))
+    elif relation == table and kind in ('Index Scan', 'Index Only Scan'):
+        condition = node.get('Index Cond')
+        access.append((
+            'index' if condition else 'full',
+            f"{kind} using {node['Index Name']}" + (f" {condition}" if condition else ""),
+        ))
+    elif relation == table and kind == 'Bitmap Heap Scan':
+        for child in node.get('Plans', []):
+            if child['Node Type'] == 'Bitmap Index Scan':
+                access.append(('index', f"Bitmap Index Scan using {child['Index Name']} {child.get('Index Cond', '')}"))
+        return access
+    for child in node.get('Plans', []):
+        access.extend(_postgresql_access(child, table))
+    return access
+
+
+def table_access(sql, table):
+    """
+    How the plan of `sql` reads `table`, as [(kind, detail)] with kind
+    'index' for index range and index-only scans and 'full' for sequential or
+    whole-index scans. Returns None on backends outside PLAN_VENDORS.
+    """
+    if connection.vendor not in PLAN_VENDORS:
+        return None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return _postgresql_access(plan[0]['Plan'], table)
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            access = []
+            for row in cursor.fetchall():
+                detail = row[-1]
+                if re.match(rf"SEARCH {re.escape(table)}\b", detail):
+                    access.append(('index', detail))
+                elif re.match(rf"SCAN {re.escape(table)}\b", detail):
+                    access.append(('full', detail))
+            return access
+
+
+def attendance_access(sql):
+    return table_access(sql, Attendance._meta.db_table)
@@ -5,16 +5,20 @@ from account.serializers import UserSerializer
 
 class EventSerializer(serializers.ModelSerializer):
     program = ProgramSerializer()
+    invalid_attendance_count = serializers.IntegerField(read_only=True)
     class Meta:
         model = Event
-        fields = ['id', 'title', 'description', 'short_code', 'program', 'is_archived', 'is_concluded']
+        fields = [
+            'id', 'title', 'description', 'short_code', 'program', 'is_archived', 'is_concluded',
+            'attendance_count', 'valid_attendance_count', 'invalid_attendance_count',
+        ]
 
 class AttendanceSerializer(serializers.ModelSerializer):
     event = EventSerializer()
     attendee = UserSerializer()
     class Meta:
         model = Attendance
-        fields = ['id', 'event', 'attendee', 'display_name', 'valid', 'created_at']
+        fields = ['id', 'event', 'attendee', 'display_name', 'valid', 'verification_status', 'created_at']
 
 class EventShortCodeSerializer(serializers.Serializer):
     short_code = serializers.CharField(max_length=100)
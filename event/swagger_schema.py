@@ -1,9 +1,18 @@
-from drf_spectacular.utils import OpenApiResponse, OpenApiExample, inline_serializer, extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, OpenApiExample, inline_serializer, extend_schema
 from rest_framework import serializers
 from .serializers import EventSerializer, AttendanceSerializer, AttendanceAdminSerializer
 from program.serializers import ProgramSerializer
 from organization.serializers import OrganizationSerializer
 
+idempotency_key_parameter = OpenApiParameter(
+    'Idempotency-Key',
+    str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description="Client-chosen key. A retry with the same key and body gets the original response back.",
+)
+
 # 19
 
 create_event_schema = extend_schema(
@@ -95,6 +104,31 @@ list_program_events_schema = extend_schema(
     }
 )
 
+export_program_attendance_schema = extend_schema(
+    summary="Export Program Attendance",
+    description=(
+        "Streams every attendance of every event in the program as a CSV or NDJSON download, "
+        "ordered by event and check-in time. Runs in constant memory for any number of rows."
+    ),
+    parameters=[
+        OpenApiParameter('file_format', str, enum=['csv', 'ndjson'], description="Defaults to csv."),
+    ],
+    responses={
+        (200, 'text/csv'): OpenApiResponse(response=OpenApiTypes.STR, description="One header row, then one row per attendance."),
+        (200, 'application/x-ndjson'): OpenApiResponse(response=OpenApiTypes.STR, description="One JSON object per line, one per attendance."),
+        400: OpenApiResponse(
+            description="Unknown file_format.",
+            response=inline_serializer(name="ExportProgramAttendanceBadRequest", fields={"error": serializers.CharField()}),
+        ),
+        404: OpenApiResponse(
+            description="Program not found.",
+            response=inline_serializer(name="ExportProgramAttendanceNotFound", fields={"detail": serializers.CharField()}),
+        ),
+    },
+    tags=["19. Create/View/Conclude/Archive/Reactivate Event (by Program Event Admin & Organizational Admin & Organizational Super Admin)"],
+)
+
+
 archive_event_schema = extend_schema(
     summary="Archive an Event",
     description=(
@@ -288,12 +322,22 @@ create_attendance_schema = extend_schema(
                     'description': 'Display name of the attendee i.e. ID of attendee in organization.'
                 },
                 "signature_base64": {"type": "string", "example": "data:image/png;base64,iVBO..."},
+                "signature_stroke": {"type": "array", "items": {"type": "array", "items": {"type": "object"}}, "example": [[{"x": 10, "y": 20}, {"x": 12, "y": 24}]]},
             },
             'required': ['display_name', "signature_base64"]
         }
     },
+    parameters=[idempotency_key_parameter],
     responses={
+        200: OpenApiResponse(
+            description="The attendee had already checked in to this event; the existing attendance.",
+            response=AttendanceSerializer,
+        ),
         201: AttendanceSerializer,
+        202: OpenApiResponse(
+            description="Recorded as pending; poll the verification status.",
+            response=AttendanceSerializer,
+        ),
         400: OpenApiResponse(
             description="Archived event.",
             response=inline_serializer(
@@ -328,7 +372,8 @@ create_attendance_schema = extend_schema(
                     response_only=True
                 )
             ]
-        )
+        ),
+        422: OpenApiResponse(description="Idempotency-Key was already used for a different request."),
     },
     summary="Create Attendance",
     description="Create a new attendance under a specific event. The event ID must be passed in the URL as `event_pk`. Display name is optional",
@@ -398,25 +443,153 @@ update_display_name_schema = extend_schema(
     }
 )
 
+verification_status_schema = extend_schema(
+    summary="Attendance Verification Status",
+    description=(
+        "Poll the signature verification of a check-in accepted with 202 while "
+        "asynchronous verification is enabled. `verification_status` is one of "
+        "pending, verified, rejected or failed.\n\n"
+    ),
+    tags=["21. Create Attendance (by Attendee)"],
+    responses={
+        200: inline_serializer(
+            name="AttendanceVerificationStatus",
+            fields={
+                "id": serializers.UUIDField(),
+                "verification_status": serializers.CharField(),
+                "valid": serializers.BooleanField(),
+                "validated_at": serializers.DateTimeField(allow_null=True),
+            }
+        )
+    }
+)
+
 # 24
 
 event_attendees_schema = extend_schema(
     summary="Get Event Attendees",
     description=(
-        "Lists all attendees of the specified event.\n\n"
+        "Lists all attendees of the specified event, newest first.\n\n"
+        "Pass `paginate=cursor` for cursor pages (`next`/`previous` links, no `count`) that stay fast at any depth."
     ),
+    parameters=[
+        OpenApiParameter('paginate', str, enum=['cursor'], description="`cursor` for cursor pagination."),
+        OpenApiParameter('cursor', str, description="Opaque position taken from a `next` or `previous` link."),
+    ],
     tags=["24. Get Event Attendees (by Program Event Admin & Organizational Admin & Organizational Super Admin)"],
     responses={
         200: AttendanceSerializer(many=True)
     }
 )
 
+export_event_attendance_schema = extend_schema(
+    summary="Export Event Attendance",
+    description=(
+        "Streams every attendance of the event as a CSV or NDJSON download in check-in order, "
+        "instead of paging through the attendee list. Runs in constant memory for any event size."
+    ),
+    parameters=[
+        OpenApiParameter('file_format', str, enum=['csv', 'ndjson'], description="Defaults to csv."),
+    ],
+    responses={
+        (200, 'text/csv'): OpenApiResponse(response=OpenApiTypes.STR, description="One header row, then one row per attendance."),
+        (200, 'application/x-ndjson'): OpenApiResponse(response=OpenApiTypes.STR, description="One JSON object per line, one per attendance."),
+        400: OpenApiResponse(
+            description="Unknown file_format.",
+            response=inline_serializer(name="ExportEventAttendanceBadRequest", fields={"error": serializers.CharField()}),
+        ),
+        404: OpenApiResponse(
+            description="Event not found.",
+            response=inline_serializer(name="ExportEventAttendanceNotFound", fields={"detail": serializers.CharField()}),
+        ),
+    },
+    tags=["24. Get Event Attendees (by Program Event Admin & Organizational Admin & Organizational Super Admin)"],
+)
+
+bulk_attendance_schema = extend_schema(
+    request={
+        'application/json': {
+            'type': 'object',
+            'properties': {
+                'records': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'email': {'type': 'string'},
+                            'phone': {'type': 'string'},
+                            'display_name': {'type': 'string'},
+                            "signature_base64": {"type": "string", "example": "data:image/png;base64,iVBO..."},
+                            "signature_stroke": {"type": "array", "items": {"type": "array", "items": {"type": "object"}}},
+                        },
+                        'required': ["signature_base64"]
+                    }
+                },
+            },
+            'required': ['records']
+        }
+    },
+    parameters=[idempotency_key_parameter],
+    responses={
+        200: OpenApiResponse(
+            description=(
+                "Per-record results in request order. status is created, existing (already checked in), "
+                "rejected, invalid or not_found."
+            ),
+            response=inline_serializer(
+                name="BulkAttendanceResponse",
+                fields={
+                    "created": serializers.IntegerField(),
+                    "results": serializers.ListField(child=serializers.DictField()),
+                }
+            ),
+            examples=[
+                OpenApiExample(
+                    name="Mixed batch",
+                    value={
+                        "created": 1,
+                        "results": [
+                            {"index": 0, "status": "created", "id": "7f1c0c6e-2a8e-4f7e-9a43-3f0c2b1d9e10"},
+                            {"index": 1, "status": "rejected", "error": "Signature mismatch."},
+                            {"index": 2, "status": "not_found", "error": "User not found."},
+                        ]
+                    },
+                    response_only=True
+                )
+            ]
+        ),
+        400: OpenApiResponse(
+            description="Archived event, or a missing or oversized batch.",
+            response=inline_serializer(
+                name="BulkAttendanceBadRequest",
+                fields={"error": serializers.CharField()}
+            ),
+        ),
+        404: OpenApiResponse(
+            description="Event not found.",
+            response=inline_serializer(
+                name="BulkAttendanceNotFound",
+                fields={"detail": serializers.CharField()}
+            ),
+        ),
+        413: OpenApiResponse(description="Request body is too large."),
+        422: OpenApiResponse(description="Idempotency-Key was already used for a different request."),
+    },
+    summary="Upload Offline Check-ins",
+    description=(
+        "Records check-ins collected by a kiosk while offline. Attendees are identified by email or phone. "
+        "Signatures are verified in batches and accepted records are saved together."
+    ),
+    tags=["24. Get Event Attendees (by Program Event Admin & Organizational Admin & Organizational Super Admin)"],
+)
+
 # 25
 
 invalidate_attendance_schema = extend_schema(
     summary="Invalidate Attendance",
     description=(
         "Invalidates the specified attendance.\n\n"
+        "Refused with 409 while the attendance's signature is still being verified in the background.\n\n"
     ),
     responses={
         200: AttendanceAdminSerializer
@@ -428,6 +601,7 @@ revalidate_attendance_schema = extend_schema(
     summary="Revalidate Attendance",
     description=(
         "Revalidates the specified attendance.\n\n"
+        "Refused with 409 while the attendance's signature is still being verified in the background.\n\n"
     ),
     responses={
         200: AttendanceAdminSerializer
@@ -1,3 +1,364 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Count, Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+import numpy as np
+from account.evaluation import synthetic_strokes
+from account.models import User
+from account.query_size import measure_fetched_bytes
+from account.signature_storage import save_signature
+from account.tests import bearer, noisy_signature
+from organization.models import Organization
+from program.models import Program
+from .models import Attendance, AttendanceVerification, Event
+from .utils import (
+    create_or_get_attendance, process_pending_verifications, queue_attendance_verification,
+    reconcile_attendance_counts,
+)
 
-# Create your tests here.
+SIGNATURE = "data:image/png;base64,iVBORw0KGgo="
+
+
+def create_user(index):
+    return User.objects.create_user(f"user{index}@example.com", f"0911{index:06d}", name=f"User {index}")
+
+
+def create_event(owner):
+    organization = Organization.objects.create(code=f"org-{owner.id}", name="Organization", created_by=owner)
+    program = Program.objects.create(name="Program", organization=organization, created_by=owner)
+    return Event.objects.create(title="Event", description="Event", program=program, created_by=owner)
+
+
+class ProcessPendingVerificationsTests(TransactionTestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.event = create_event(self.owner)
+        self.attendances = []
+        for index in range(1, 4):
+            attendance = Attendance.objects.create(event=self.event, attendee=create_user(index))
+            queue_attendance_verification(attendance, SIGNATURE)
+            self.attendances.append(attendance)
+
+    def test_inference_runs_on_claimed_rows_outside_a_transaction(self):
+        def match(attendee, *args):
+            self.assertFalse(connection.in_atomic_block)
+            verification = AttendanceVerification.objects.get(attendance__attendee=attendee)
+            self.assertIsNotNone(verification.claimed_at)
+            return True, 'cnn_accept'
+
+        with mock.patch('event.utils.match_signature', side_effect=match):
+            self.assertEqual(process_pending_verifications(), 3)
+        self.assertFalse(AttendanceVerification.objects.exists())
+        self.assertEqual(Attendance.objects.filter(valid=True, verification_status=Attendance.VERIFIED).count(), 3)
+
+    def test_one_failing_row_does_not_affect_the_others(self):
+        results = iter([RuntimeError("model crashed"), (True, 'cnn_accept'), (False, 'cnn_reject')])
+
+        def match(*args):
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with mock.patch('event.utils.match_signature', side_effect=match), self.assertLogs('event.utils', 'ERROR'):
+            self.assertEqual(process_pending_verifications(), 2)
+        retry = AttendanceVerification.objects.get()
+        self.assertEqual((retry.attempts, retry.last_error, retry.claimed_at), (1, "model crashed", None))
+        statuses = sorted(Attendance.objects.values_list('verification_status', flat=True))
+        self.assertEqual(statuses, [Attendance.PENDING, Attendance.REJECTED, Attendance.VERIFIED])
+
+    def test_database_errors_are_not_swallowed(self):
+        with mock.patch('event.utils.match_signature', side_effect=OperationalError("connection lost")):
+            with self.assertRaises(OperationalError):
+                process_pending_verifications()
+        self.assertEqual(AttendanceVerification.objects.filter(claimed_at=None, attempts=0).count(), 3)
+
+    def test_claimed_rows_are_left_alone_until_the_claim_goes_stale(self):
+        AttendanceVerification.objects.update(claimed_at=timezone.now())
+        with mock.patch('event.utils.match_signature', return_value=(True, 'cnn_accept')) as match:
+            self.assertEqual(process_pending_verifications(), 0)
+            match.assert_not_called()
+
+            stale = timezone.now() - timedelta(seconds=settings.SIGNATURE_VERIFICATION_CLAIM_TIMEOUT + 1)
+            AttendanceVerification.objects.update(claimed_at=stale)
+            self.assertEqual(process_pending_verifications(), 3)
+
+
+class QuerySizeTests(TestCase):
+    """Attendance endpoints never fetch the attendees' signature blobs (about 160 kB each here)."""
+
+    def setUp(self):
+        self.owner = create_user(0)
+        self.event = create_event(self.owner)
+        self.attendees = []
+        for index in range(1, 6):
+            attendee = create_user(index)
+            save_signature(attendee, noisy_signature(index), synthetic_strokes(np.random.default_rng(index)))
+            Attendance.objects.create(event=self.event, attendee=attendee)
+            self.attendees.append(attendee)
+
+    def assert_budget(self, user, path, budget):
+        with measure_fetched_bytes() as fetched:
+            response = self.client.get(path, HTTP_AUTHORIZATION=bearer(user))
+        self.assertEqual(response.status_code, 200, path)
+        self.assertLessEqual(fetched.bytes, budget, path)
+        self.assertLessEqual(len(response.content), budget, path)
+
+    def test_attendee_endpoints(self):
+        prefix = '/digital_attendance/api/event/attendance'
+        for name, budget in [
+            ('my_attendances', 3_000),
+            ('my_attended_programs', 2_000),
+            ('my_attended_organizations', 2_000),
+        ]:
+            self.assert_budget(self.attendees[0], f"{prefix}/{name}/", budget)
+
+    def test_event_attendee_list(self):
+        self.assert_budget(self.owner, f"/digital_attendance/api/event/events/{self.event.id}/attendance/", 12_000)
+
+    def test_event_attendee_list_by_cursor(self):
+        path = f"/digital_attendance/api/event/events/{self.event.id}/attendance/?paginate=cursor&page_size=2"
+        seen = []
+        while path:
+            response = self.client.get(path, HTTP_AUTHORIZATION=bearer(self.owner))
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            path = response.data['next']
+        newest_first = Attendance.objects.filter(event=self.event).order_by('-created_at', '-id')
+        self.assertEqual(seen, [str(pk) for pk in newest_first.values_list('id', flat=True)])
+
+
+def enroll(user):
+    save_signature(user, noisy_signature(size=32), synthetic_strokes(np.random.default_rng(0)))
+    return user
+
+
+@mock.patch('event.views.match_signature', return_value=(True, 'cnn_accept'))
+class AttendanceCreateTests(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.event = create_event(self.owner)
+        self.attendee = enroll(create_user(1))
+        self.url = f"/digital_attendance/api/event/events/{self.event.id}/attendance/"
+
+    def check_in(self, key=None, **body):
+        headers = {'HTTP_AUTHORIZATION': bearer(self.attendee)}
+        if key:
+            headers['HTTP_IDEMPOTENCY_KEY'] = key
+        data = {'signature_base64': SIGNATURE, 'display_name': "Attendee", **body}
+        return self.client.post(self.url, data, content_type='application/json', **headers)
+
+    def test_first_check_in_is_created(self, match):
+        response = self.check_in()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(str(Attendance.objects.get().id), response.json()['id'])
+
+    def test_retry_with_the_same_key_is_replayed(self, match):
+        first = self.check_in(key="tap-1")
+        retry = self.check_in(key="tap-1")
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(match.call_count, 1)
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_duplicate_without_a_key_returns_the_existing_attendance(self, match):
+        first = self.check_in()
+        second = self.check_in()
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertEqual(second.json()['id'], first.json()['id'])
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_reused_key_with_a_different_body_is_refused(self, match):
+        self.check_in(key="tap-1")
+        response = self.check_in(key="tap-1", display_name="Someone else")
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('error', response.json())
+        self.assertEqual(match.call_count, 1)
+
+
+class CreateOrGetAttendanceTests(TestCase):
+    def setUp(self):
+        self.event = create_event(create_user(0))
+        self.attendee = create_user(1)
+
+    def check_create_or_get(self):
+        first, created = create_or_get_attendance(self.event, self.attendee, display_name="First", valid=True)
+        self.assertTrue(created)
+        second, created = create_or_get_attendance(self.event, self.attendee, display_name="Second", valid=True)
+        self.assertFalse(created)
+        self.assertEqual((second.id, second.display_name), (first.id, "First"))
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_upsert(self):
+        self.assertIn(connection.vendor, ('postgresql', 'sqlite'))
+        self.check_create_or_get()
+
+    def test_insert_then_lookup_on_other_backends(self):
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            self.check_create_or_get()
+
+
+class AttendanceCounterTests(TestCase):
+    """Event counters equal the Attendance aggregates after every path that changes them."""
+
+    def setUp(self):
+        self.owner = create_user(0)
+        self.event = create_event(self.owner)
+        self.attendees = [enroll(create_user(index)) for index in range(1, 5)]
+        self.url = f"/digital_attendance/api/event/events/{self.event.id}/attendance/"
+
+    def assert_counts(self, total, valid):
+        self.event.refresh_from_db()
+        counted = Attendance.objects.filter(event=self.event).aggregate(
+            total=Count('id'), valid=Count('id', filter=Q(valid=True))
+        )
+        self.assertEqual((self.event.attendance_count, self.event.valid_attendance_count), (total, valid))
+        self.assertEqual((counted['total'], counted['valid']), (total, valid))
+
+    def check_in(self, attendee):
+        with mock.patch('event.views.match_signature', return_value=(True, 'cnn_accept')):
+            return self.client.post(
+                self.url, {'signature_base64': SIGNATURE}, content_type='application/json',
+                HTTP_AUTHORIZATION=bearer(attendee),
+            )
+
+    def change_validity(self, attendance_id, action):
+        return self.client.post(
+            f"/digital_attendance/api/event/attendance/{attendance_id}/{action}/",
+            HTTP_AUTHORIZATION=bearer(self.owner),
+        )
+
+    def test_check_ins(self):
+        self.check_in(self.attendees[0])
+        self.check_in(self.attendees[0])
+        self.check_in(self.attendees[1])
+        self.assert_counts(2, 2)
+
+    def test_invalidate_and_revalidate(self):
+        attendance_id = self.check_in(self.attendees[0]).json()['id']
+        self.check_in(self.attendees[1])
+
+        self.assertEqual(self.change_validity(attendance_id, 'invalidate_attendance').status_code, 200)
+        self.assert_counts(2, 1)
+        self.assertEqual(self.change_validity(attendance_id, 'invalidate_attendance').status_code, 400)
+        self.assert_counts(2, 1)
+        self.assertEqual(self.change_validity(attendance_id, 'revalidate_attendance').status_code, 200)
+        self.assertEqual(self.change_validity(attendance_id, 'revalidate_attendance').status_code, 400)
+        self.assert_counts(2, 2)
+
+    def test_bulk_upload(self):
+        self.check_in(self.attendees[0])
+        records = [
+            {'email': attendee.email, 'signature_base64': SIGNATURE}
+            for attendee in self.attendees + [self.attendees[1]]
+        ]
+        verdicts = [(True, 'cnn_accept'), (True, 'cnn_accept'), (False, 'cnn_reject'), (True, 'cnn_accept'),
+                    (True, 'cnn_accept')]
+        with mock.patch('event.views.match_signatures', return_value=verdicts):
+            response = self.client.post(
+                f"{self.url}bulk/", {'records': records}, content_type='application/json',
+                HTTP_AUTHORIZATION=bearer(self.owner),
+            )
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(
+            [result['status'] for result in response.json()['results']],
+            ['existing', 'created', 'rejected', 'created', 'existing'],
+        )
+        self.assert_counts(3, 3)
+
+    @override_settings(SIGNATURE_ASYNC_ATTENDANCE=True)
+    def test_background_verification(self):
+        self.assertEqual(self.check_in(self.attendees[0]).status_code, 202)
+        self.check_in(self.attendees[1])
+        self.assert_counts(2, 0)
+        with mock.patch('event.utils.match_signature', side_effect=[(True, 'cnn_accept'), (False, 'cnn_reject')]):
+            process_pending_verifications()
+        self.assert_counts(2, 1)
+
+    @override_settings(SIGNATURE_ASYNC_ATTENDANCE=True)
+    def test_staff_wait_for_background_verification(self):
+        attendance_id = self.check_in(self.attendees[0]).json()['id']
+        self.assertEqual(self.change_validity(attendance_id, 'revalidate_attendance').status_code, 409)
+        self.assertEqual(self.change_validity(attendance_id, 'invalidate_attendance').status_code, 409)
+        with mock.patch('event.utils.match_signature', return_value=(False, 'cnn_reject')):
+            process_pending_verifications()
+        self.assert_counts(1, 0)
+        self.assertEqual(self.change_validity(attendance_id, 'revalidate_attendance').status_code, 200)
+        attendance = Attendance.objects.get(id=attendance_id)
+        self.assertEqual((attendance.valid, attendance.validated_by), (True, self.owner))
+        self.assert_counts(1, 1)
+
+    def test_reconciliation(self):
+        for attendee in self.attendees[:3]:
+            self.check_in(attendee)
+        Attendance.objects.filter(attendee=self.attendees[0]).delete()
+        Attendance.objects.filter(attendee=self.attendees[1]).update(valid=False)
+
+        drifted = reconcile_attendance_counts(dry_run=True)
+        self.assertEqual([(event.id, total, valid) for event, total, valid in drifted], [(self.event.id, 2, 1)])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendance_count, 3)
+
+        call_command('reconcile_attendance_counts', stdout=io.StringIO())
+        self.assert_counts(2, 1)
+        self.assertEqual(reconcile_attendance_counts(), [])
+
+
+class ExplainAttendanceQueriesTests(TestCase):
+    def test_unsupported_vendor_is_reported(self):
+        out = io.StringIO()
+        with mock.patch.object(connection, 'vendor', 'oracle'):
+            call_command('explain_attendance_queries', '--seed', '10', stdout=out)
+        self.assertIn("plan check unsupported on oracle", out.getvalue())
+        self.assertFalse(Attendance.objects.exists())
+
+
+class AttendanceExportTests(TestCase):
+    values = {
+        "+251 (911) 234-567": "+251 (911) 234-567",
+        "-12.5": "-12.5",
+        "=HYPERLINK(\"http://example.com\")": "'=HYPERLINK(\"http://example.com\")",
+        "+SUM(A1:A2)": "'+SUM(A1:A2)",
+        "-1+cmd|' /C calc'!A0": "'-1+cmd|' /C calc'!A0",
+        "@SUM(A1)": "'@SUM(A1)",
+        "Abebe": "Abebe",
+    }
+
+    def setUp(self):
+        self.owner = create_user(0)
+        self.event = create_event(self.owner)
+        for index, display_name in enumerate(self.values, start=1):
+            attendee = create_user(index)
+            # Stored as entered, e.g. by an import; create_user strips the +.
+            User.objects.filter(id=attendee.id).update(phone=f"+2519110000{index:02d}")
+            Attendance.objects.create(event=self.event, attendee=attendee, display_name=display_name)
+
+    def export(self, file_format):
+        response = self.client.get(
+            f"/digital_attendance/api/event/events/{self.event.id}/attendance/export/?file_format={file_format}",
+            HTTP_AUTHORIZATION=bearer(self.owner),
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_escapes_formulas_but_not_numbers(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual(sorted(row['display_name'] for row in rows), sorted(self.values.values()))
+        for row in rows:
+            self.assertTrue(row['attendee_phone'].startswith('+251911'), row['attendee_phone'])
+
+    def test_ndjson_is_not_escaped(self):
+        rows = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertEqual(sorted(row['display_name'] for row in rows), sorted(self.values))
+        for row in rows:
+            self.assertTrue(row['attendee_phone'].startswith('+251911'), row['attendee_phone'])
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from account.preprocessing import InvalidSignature
+from account.utils import match_signature
+from account.verification_pool import SignatureVerificationUnavailable
+from .models import Attendance, AttendanceVerification, Event, IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+
+def adjust_attendance_counts(event_id, attendances=0, valid=0):
+    """Move an event's attendance counters by the given deltas in one UPDATE."""
+    changes = {}
+    if attendances:
+        changes['attendance_count'] = F('attendance_count') + attendances
+    if valid:
+        changes['valid_attendance_count'] = F('valid_attendance_count') + valid
+    if changes:
+        Event.objects.filter(id=event_id).update(**changes)
+
+
+def set_attendance_validity(attendance, valid, **fields):
+    """
+    Set attendance.valid (and any `fields`) and move the event's valid
+    counter, unless the stored row already had that value or is still
+    waiting for background verification, whose verdict would overrule it.
+    The conditional UPDATE keeps concurrent flips from being counted twice.
+    Returns whether the row changed.
+    """
+    with transaction.atomic():
+        changed = Attendance.objects.filter(id=attendance.id, valid=not valid).exclude(
+            verification_status=Attendance.PENDING
+        ).update(
+            valid=valid, updated_at=timezone.now(), **fields
+        )
+        if changed:
+            adjust_attendance_counts(attendance.event_id, valid=1 if valid else -1)
+    if changed:
+        attendance.valid = valid
+        for name, value in fields.items():
+            setattr(attendance, name, value)
+    return bool(changed)
+
+
+def reconcile_attendance_counts(events=None, dry_run=False):
+    """
+    Recount attendances of `events` (default: all) and repair counters that
+    drifted, e.g. after rows were deleted. Returns [(event, counted,
+    counted valid)] for every event that was off.
+    """
+    events = (events if events is not None else Event.objects.all()).annotate(
+        counted=Count('attendance'),
+        counted_valid=Count('attendance', filter=Q(attendance__valid=True)),
+    ).exclude(attendance_count=F('counted'), valid_attendance_count=F('counted_valid'))
+    repaired = []
+    for event in events.only('id', 'title', 'attendance_count', 'valid_attendance_count'):
+        if not dry_run:
+            with transaction.atomic():
+                # Lock the row so check-ins landing meanwhile apply their deltas after the recount.
+                Event.objects.select_for_update().filter(id=event.id).first()
+                counts = Attendance.objects.filter(event_id=event.id).aggregate(
+                    total=Count('id'), valid=Count('id', filter=Q(valid=True))
+                )
+                Event.objects.filter(id=event.id).update(
+                    attendance_count=counts['total'], valid_attendance_count=counts['valid']
+                )
+            event.counted, event.counted_valid = counts['total'], counts['valid']
+        repaired.append((event, event.counted, event.counted_valid))
+    return repaired
+
+
+def _upsert_sql(connection):
+    meta = Attendance._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in meta.concrete_fields)
+    event, attendee = quote(meta.get_field('event').column), quote(meta.get_field('attendee').column)
+    return (
+        f"INSERT INTO {quote(meta.db_table)} ({columns}) "
+        f"VALUES ({', '.join(['%s'] * len(meta.concrete_fields))}) "
+        # A no-op update so RETURNING also yields the row that was already there.
+        f"ON CONFLICT ({event}, {attendee}) DO UPDATE SET {event} = EXCLUDED.{event} "
+        f"RETURNING {columns}"
+    )
+
+
+def create_or_get_attendance(event, attendee, **fields):
+    """
+    Record an attendance, or return the one the attendee already has for the
+    event, as (attendance, created). PostgreSQL and SQLite do it in a single
+    INSERT ... ON CONFLICT ... RETURNING; other backends insert and look the
+    row up again if the unique constraint refuses it.
+    """
+    attendance = Attendance(event=event, attendee=attendee, **fields)
+    connection = connections[Attendance.objects.db]
+    if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_rows_from_bulk_insert:
+        params = [
+            field.get_db_prep_save(field.pre_save(attendance, True), connection)
+            for field in Attendance._meta.concrete_fields
+        ]
+        stored = next(iter(Attendance.objects.raw(_upsert_sql(connection), params)))
+        return stored, stored.id == attendance.id
+    try:
+        with transaction.atomic():
+            attendance.save(force_insert=True)
+        return attendance, True
+    except IntegrityError:
+        return Attendance.objects.get(event=event, attendee=attendee), False
+
+
+def request_hash(request):
+    """Fingerprint of a request's method, path and JSON body, to spot a reused Idempotency-Key."""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def find_idempotent_response(user, key):
+    """The stored response for an unexpired Idempotency-Key of this user, or None."""
+    expiry = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    return IdempotencyKey.objects.filter(user=user, key=key, created_at__gte=expiry).first()
+
+
+def save_idempotent_response(user, key, fingerprint, response):
+    """Remember a successful response under its Idempotency-Key; the user's expired keys are dropped."""
+    expiry = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    IdempotencyKey.objects.filter(user=user, created_at__lt=expiry).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                user=user,
+                key=key,
+                request_hash=fingerprint,
+                status_code=response.status_code,
+                response=response.data,
+            )
+    except IntegrityError:
+        # A concurrent retry with the same key finished first.
+        pass
+
+
+def queue_attendance_verification(attendance, signature_base64, signature_stroke=None):
+    """Mark a fresh attendance as pending and hand its signature to the verification worker."""
+    attendance.valid = False
+    attendance.verification_status = Attendance.PENDING
+    attendance.save(update_fields=['valid', 'verification_status', 'updated_at'])
+    return AttendanceVerification.objects.create(
+        attendance=attendance,
+        signature_base64=signature_base64,
+        signature_stroke=signature_stroke,
+    )
+
+
+def claim_pending_verifications(batch_size):
+    """
+    Claim up to `batch_size` pending check-ins, oldest first, in one short
+    transaction and return them. Rows are picked with SKIP LOCKED and
+    stamped with claimed_at, so several workers can drain the queue side by
+    side; claims older than SIGNATURE_VERIFICATION_CLAIM_TIMEOUT seconds are
+    taken over, so rows held by a crashed worker are retried.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.SIGNATURE_VERIFICATION_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        ids = list(
+            AttendanceVerification.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale))
+            .order_by('created_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        AttendanceVerification.objects.filter(id__in=ids).update(claimed_at=now)
+    return list(
+        AttendanceVerification.objects
+        .filter(id__in=ids, claimed_at=now)
+        .select_related('attendance', 'attendance__attendee', 'attendance__attendee__signature')
+        .defer('attendance__attendee__signature__image')
+        .order_by('created_at')
+    )
+
+
+def _claimed(verification):
+    return AttendanceVerification.objects.filter(id=verification.id, claimed_at=verification.claimed_at)
+
+
+def release_verifications(verifications):
+    """Hand claimed check-ins back to the queue untouched."""
+    for verification in verifications:
+        _claimed(verification).update(claimed_at=None)
+
+
+def _finish(verification, status, valid):
+    """
+    Settle one claimed check-in in its own transaction. Returns False if the
+    claim was taken over meanwhile, in which case nothing is changed.
+    """
+    attendance = verification.attendance
+    with transaction.atomic():
+        deleted, _ = _claimed(verification).delete()
+        if not deleted:
+            return False
+        attendance.verification_status = status
+        attendance.save(update_fields=['verification_status', 'updated_at'])
+        if valid:
+            set_attendance_validity(attendance, True, validated_at=timezone.now())
+        else:
+            set_attendance_validity(attendance, False)
+    return True
+
+
+def _record_failure(verification, error):
+    """Count a failed attempt; returns True once the check-in is given up on and settled as failed."""
+    if verification.attempts + 1 >= settings.SIGNATURE_VERIFICATION_MAX_ATTEMPTS:
+        return _finish(verification, Attendance.FAILED, False)
+    _claimed(verification).update(attempts=F('attempts') + 1, last_error=str(error), claimed_at=None)
+    return False
+
+
+def process_pending_verifications(batch_size=16):
+    """
+    Verify up to `batch_size` pending check-ins, oldest first, and return how
+    many were settled. Signatures are checked outside any transaction, so no
+    row locks are held during inference; each row is then settled on its own.
+    """
+    settled = 0
+    claimed = claim_pending_verifications(batch_size)
+    for position, verification in enumerate(claimed):
+        attendee = verification.attendance.attendee
+        try:
+            matched, stage = match_signature(
+                attendee, verification.signature_base64, verification.signature_stroke
+            )
+        except InvalidSignature:
+            settled += _finish(verification, Attendance.REJECTED, False)
+        except SignatureVerificationUnavailable:
+            # The pool is saturated; leave the rest for the next round.
+            release_verifications(claimed[position:])
+            break
+        except DatabaseError:
+            release_verifications(claimed[position:])
+            raise
+        except Exception as e:
+            logger.exception("Verifying attendance %s failed", verification.attendance_id)
+            settled += _record_failure(verification, e)
+        else:
+            settled += _finish(verification, Attendance.VERIFIED if matched else Attendance.REJECTED, matched)
+    return settled
@@ -1,3 +1,4 @@
+import logging
 from rest_framework.viewsets import GenericViewSet
 from .models import Event, Attendance
 from .serializers import EventCreateSerializer, EventSerializer, AttendanceSerializer, EventAdminSerializer, AttendanceAdminSerializer
@@ -6,16 +7,32 @@ from rest_framework.permissions import AllowAny
 from program.models import Program
 from rest_framework.response import Response
 from rest_framework import status
-from .pagination import CustomPageNumberPagination
+from .pagination import CustomPageNumberPagination, OptionalCursorPagination
+from .exports import EXPORT_FORMATS, attendance_export_response
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
 from django.utils import timezone
 from program.models import Program
 from program.serializers import ProgramSerializer
 from django.db.models import Q
 from organization.models import Organization
 from organization.serializers import OrganizationSerializer
-from account.utils import calculate_signature_similarity
+from account.models import User
+from account.parsers import BulkSignatureJSONParser, SignatureJSONParser
+from account.preprocessing import InvalidSignature, decode_data_url, server_timing
+from account.signature_storage import get_signature
+from account.utils import match_signature, match_signatures
+from .utils import (
+    adjust_attendance_counts,
+    create_or_get_attendance,
+    find_idempotent_response,
+    queue_attendance_verification,
+    request_hash,
+    save_idempotent_response,
+    set_attendance_validity,
+)
 from django.conf import settings
+from django.db import transaction
 from .swagger_schema import (
     create_event_schema,
     list_program_events_schema,
@@ -24,11 +41,15 @@ from .swagger_schema import (
     reactivate_event_schema,
     get_event_by_short_code_schema,
     create_attendance_schema,
+    bulk_attendance_schema,
     list_attended_programs_schema,
     list_attended_organizations_schema,
     list_my_attendances_schema,
     update_display_name_schema,
+    verification_status_schema,
     event_attendees_schema,
+    export_event_attendance_schema,
+    export_program_attendance_schema,
     invalidate_attendance_schema,
     revalidate_attendance_schema
 )
@@ -39,6 +60,9 @@ from .permissions import (
     NestedAttendanceViewSetPermissions
 )
 
+logger = logging.getLogger(__name__)
+
+
 # Create your views here.
 class EventViewSet(GenericViewSet):
     serializer_class = EventSerializer
@@ -132,6 +156,19 @@ class NestedEventViewSet(ListModelMixin, CreateModelMixin, GenericViewSet):
         except Program.DoesNotExist:
             return Response({"detail": "Program not found."}, status=status.HTTP_404_NOT_FOUND)
 
+    @export_program_attendance_schema
+    @action(detail=False, methods=['get'])
+    def export_attendance(self, request, *args, **kwargs):
+        """Stream every attendance of the program's events as CSV or NDJSON."""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({"error": "file_format must be csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        program = Program.objects.filter(id=self.kwargs.get('program_pk')).first()
+        if program is None:
+            return Response({"detail": "Program not found."}, status=status.HTTP_404_NOT_FOUND)
+        attendances = Attendance.objects.filter(event__program=program).order_by('event_id', 'created_at', 'id')
+        return attendance_export_response(attendances, file_format, f"attendance-program-{program.id}")
+
 class AttendanceViewset(GenericViewSet):
     serializer_class = AttendanceSerializer
     queryset = Attendance.objects.all().select_related('event', 'event__program', 'event__program__organization', 'attendee', 'validated_by', 'invalidated_by')
@@ -173,7 +210,7 @@ class AttendanceViewset(GenericViewSet):
     @list_my_attendances_schema
     @action(detail=False, methods=['get'])
     def my_attendances(self, request, *args, **kwargs):
-        attendances = Attendance.objects.select_related('event', 'event__program', 'event__program__organization', 'attendee', 'validated_by', 'invalidated_by').filter(attendee=request.user)
+        attendances = Attendance.objects.select_related('event', 'event__program', 'event__program__organization', 'attendee', 'validated_by', 'invalidated_by').filter(attendee=request.user).order_by('-created_at')
         paginated_queryset = self.paginate_queryset(attendances)
         if paginated_queryset is not None:
             serializer = AttendanceSerializer(paginated_queryset, many=True)
@@ -186,26 +223,41 @@ class AttendanceViewset(GenericViewSet):
     @action(detail=True, methods=['post'])
     def invalidate_attendance(self, request, pk=None):
         attendance = self.get_object()
-        if not attendance.valid:
+        if attendance.verification_status == Attendance.PENDING:
+            return Response(
+                {"error": "Attendance signature is still being verified."}, status=status.HTTP_409_CONFLICT
+            )
+        if not set_attendance_validity(
+            attendance, False, invalidated_by=request.user, invalidated_at=timezone.now()
+        ):
             return Response({"error": "Attendance is already invalidated."}, status=status.HTTP_400_BAD_REQUEST)
-        attendance.valid = False
-        attendance.invalidated_by = request.user
-        attendance.invalidated_at = timezone.now()
-        attendance.save()
         return Response(AttendanceAdminSerializer(attendance).data, status=status.HTTP_200_OK)
     
     @revalidate_attendance_schema
     @action(detail=True, methods=['post'])
     def revalidate_attendance(self, request, pk=None):
         attendance = self.get_object()
-        if attendance.valid:
+        if attendance.verification_status == Attendance.PENDING:
+            return Response(
+                {"error": "Attendance signature is still being verified."}, status=status.HTTP_409_CONFLICT
+            )
+        if not set_attendance_validity(
+            attendance, True, validated_by=request.user, validated_at=timezone.now()
+        ):
             return Response({"error": "Attendance is already validated."}, status=status.HTTP_400_BAD_REQUEST)
-        attendance.valid = True
-        attendance.validated_by = request.user
-        attendance.validated_at = timezone.now()
-        attendance.save()
         return Response(AttendanceAdminSerializer(attendance).data, status=status.HTTP_200_OK)
     
+    @verification_status_schema
+    @action(detail=True, methods=['get'])
+    def verification_status(self, request, pk=None):
+        attendance = self.get_object()
+        return Response({
+            "id": attendance.id,
+            "verification_status": attendance.verification_status,
+            "valid": attendance.valid,
+            "validated_at": attendance.validated_at,
+        }, status=status.HTTP_200_OK)
+
     @update_display_name_schema
     @action(detail=True, methods=['patch'])
     def update_display_name(self, request, pk=None):
@@ -219,7 +271,11 @@ class NestedAttendanceViewset(ListModelMixin,CreateModelMixin, GenericViewSet):
     serializer_class = AttendanceSerializer
     queryset = Attendance.objects.all().select_related('event', 'event__program', 'event__program__organization', 'attendee', 'validated_by', 'invalidated_by')
     permission_classes = [NestedAttendanceViewSetPermissions]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = OptionalCursorPagination
+    # Matches attendance_event_recent_idx, so every cursor page is one index range read.
+    cursor_ordering = ('-created_at', '-id')
+    # JSON bodies are size-limited for signature uploads; form clients keep DRF's usual parsers.
+    parser_classes = [SignatureJSONParser, FormParser, MultiPartParser]
 
     @event_attendees_schema
     def list(self, request, *args, **kwargs):
@@ -232,24 +288,67 @@ class NestedAttendanceViewset(ListModelMixin,CreateModelMixin, GenericViewSet):
     
     def get_queryset(self):
         event_id = self.kwargs.get('event_pk')
-        return self.queryset.filter(event__id=event_id)
+        return self.queryset.filter(event__id=event_id).order_by('-created_at', '-id')
     
+    def replay_idempotent(self, request):
+        """
+        The stored response when this request repeats an earlier Idempotency-Key,
+        or an error if the key came with a different request; None otherwise.
+        """
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return None
+        if len(key) > 255:
+            return Response({"error": "Idempotency-Key is too long."}, status=status.HTTP_400_BAD_REQUEST)
+        stored = find_idempotent_response(request.user, key)
+        if stored is None:
+            return None
+        if stored.request_hash != request_hash(request):
+            return Response({
+                "error": "Idempotency-Key was already used for a different request."
+            }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = Response(stored.response, status=stored.status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def remember_idempotent(self, request, response):
+        key = request.headers.get('Idempotency-Key')
+        if key and status.is_success(response.status_code):
+            save_idempotent_response(request.user, key, request_hash(request), response)
+        return response
+
     @create_attendance_schema
     def create(self, request, *args, **kwargs):
         event_id = self.kwargs.get('event_pk')
         signature_base64 = request.data.get('signature_base64')
         user = request.user
-        if user is None or not user.is_authenticated or user.signaturebase64 is None:
+        if user is None or not user.is_authenticated or get_signature(user) is None:
             return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
+        # A retried request gets its original answer without running inference again.
+        replay = self.replay_idempotent(request)
+        if replay is not None:
+            return replay
+
         # Check the signature similarity
-        base64_existing_signature = user.signaturebase64
-        if signature_base64 and base64_existing_signature:
-            similarity = calculate_signature_similarity(signature_base64, base64_existing_signature)
-            print("Signature similarity:", similarity)
+        timings = {}
+        verify_later = bool(settings.SIGNATURE_ASYNC_ATTENDANCE and signature_base64)
+        if verify_later:
+            # Cheap checks now, so malformed or oversized uploads never reach the queue.
+            try:
+                decode_data_url(signature_base64)
+            except InvalidSignature:
+                return Response({"error": "Signature missing or invalid."}, status=status.HTTP_400_BAD_REQUEST)
+        if signature_base64 and not verify_later:
+            try:
+                matched, stage = match_signature(
+                    user, signature_base64, request.data.get('signature_stroke'), timings=timings
+                )
+            except InvalidSignature:
+                return Response({"error": "Signature missing or invalid."}, status=status.HTTP_400_BAD_REQUEST)
+            logger.info("Signature of %s decided by %s", user.id, stage)
 
-            # If similarity is greater than 50%, authenticate user and issue tokens
-            if similarity < settings.SIGNATURE_THRESHOLD:
+            if not matched:
                 return Response({
                     "error": "Signature mismatch. Please try again!"
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -258,12 +357,123 @@ class NestedAttendanceViewset(ListModelMixin,CreateModelMixin, GenericViewSet):
             if event.is_archived:
                 return Response({"error": "Event is archived."}, status=status.HTTP_400_BAD_REQUEST)
             display_name = request.data.get('display_name')
-            attendance = Attendance.objects.create(
-                event=event,
-                attendee=request.user,
-                display_name=display_name,
-                valid=True,
-            )
-            return Response(AttendanceSerializer(attendance).data, status=status.HTTP_201_CREATED)
+            with transaction.atomic():
+                # A double tap gets back the attendance it already has.
+                attendance, created = create_or_get_attendance(
+                    event, request.user, display_name=display_name, valid=True
+                )
+                if verify_later and created:
+                    # Answer at database speed; the verification worker settles it.
+                    queue_attendance_verification(
+                        attendance, signature_base64, request.data.get('signature_stroke')
+                    )
+                if created:
+                    adjust_attendance_counts(event.id, attendances=1, valid=1 if attendance.valid else 0)
+            if not created:
+                response_status = status.HTTP_200_OK
+            elif verify_later:
+                response_status = status.HTTP_202_ACCEPTED
+            else:
+                response_status = status.HTTP_201_CREATED
+            response = Response(AttendanceSerializer(attendance).data, status=response_status)
+            response['Server-Timing'] = server_timing(timings)
+            return self.remember_idempotent(request, response)
+        except Event.DoesNotExist:
+            return Response({"detail": "Event not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    @export_event_attendance_schema
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """Stream every attendance of the event as CSV or NDJSON, without paging."""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({"error": "file_format must be csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        event = Event.objects.filter(id=self.kwargs.get('event_pk')).first()
+        if event is None:
+            return Response({"detail": "Event not found."}, status=status.HTTP_404_NOT_FOUND)
+        attendances = Attendance.objects.filter(event=event).order_by('created_at', 'id')
+        return attendance_export_response(attendances, file_format, f"attendance-{event.short_code}")
+
+    @bulk_attendance_schema
+    @action(detail=False, methods=['post'], parser_classes=[BulkSignatureJSONParser])
+    def bulk(self, request, *args, **kwargs):
+        """Check in a batch of attendees recorded by an offline kiosk, with one result per record."""
+        records = request.data.get('records')
+        if not isinstance(records, list) or not records:
+            return Response({"error": "records must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(records) > settings.SIGNATURE_BULK_MAX_RECORDS:
+            return Response({
+                "error": f"At most {settings.SIGNATURE_BULK_MAX_RECORDS} records can be sent at once."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            event = Event.objects.get(id=self.kwargs.get('event_pk'))
         except Event.DoesNotExist:
             return Response({"detail": "Event not found."}, status=status.HTTP_404_NOT_FOUND)
+        if event.is_archived:
+            return Response({"error": "Event is archived."}, status=status.HTTP_400_BAD_REQUEST)
+        replay = self.replay_idempotent(request)
+        if replay is not None:
+            return replay
+
+        # One query for every attendee in the batch.
+        objects = [record for record in records if isinstance(record, dict)]
+        emails = {record['email'] for record in objects if isinstance(record.get('email'), str)}
+        phones = {record['phone'] for record in objects if isinstance(record.get('phone'), str)}
+        users = User.objects.with_signature().filter(Q(email__in=emails) | Q(phone__in=phones))
+        by_email = {user.email: user for user in users}
+        by_phone = {user.phone: user for user in by_email.values()}
+
+        results = [None] * len(records)
+        checks, indexes = [], []
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                results[index] = {"index": index, "status": "invalid", "error": "Record must be an object."}
+                continue
+            user = by_email.get(record.get('email')) or by_phone.get(record.get('phone'))
+            signature_base64 = record.get('signature_base64')
+            if user is None or get_signature(user) is None:
+                results[index] = {"index": index, "status": "not_found", "error": "User not found."}
+            elif not isinstance(signature_base64, str) or not signature_base64:
+                results[index] = {"index": index, "status": "invalid", "error": "Signature missing or invalid."}
+            else:
+                checks.append((user, signature_base64, record.get('signature_stroke')))
+                indexes.append(index)
+
+        attendances = {}
+        accepted = []
+        for index, (user, _, _), (matched, stage) in zip(indexes, checks, match_signatures(checks)):
+            if stage == 'invalid':
+                results[index] = {"index": index, "status": "invalid", "error": "Signature missing or invalid."}
+            elif not matched:
+                results[index] = {"index": index, "status": "rejected", "error": "Signature mismatch."}
+            else:
+                if user.id not in attendances:
+                    attendances[user.id] = Attendance(
+                        event=event,
+                        attendee=user,
+                        display_name=records[index].get('display_name'),
+                        valid=True,
+                    )
+                accepted.append((index, attendances[user.id]))
+
+        # Attendees already checked in (or repeated in the batch) keep their one attendance.
+        with transaction.atomic():
+            Attendance.objects.bulk_create(attendances.values(), ignore_conflicts=True)
+            stored = dict(
+                Attendance.objects.filter(event=event, attendee_id__in=attendances).values_list('attendee_id', 'id')
+            )
+            new_ids = {
+                attendance.id for attendance in attendances.values() if stored[attendance.attendee_id] == attendance.id
+            }
+            adjust_attendance_counts(event.id, attendances=len(new_ids), valid=len(new_ids))
+        reported = set()
+        for index, attendance in accepted:
+            attendance_id = stored[attendance.attendee_id]
+            new = attendance_id in new_ids and attendance_id not in reported
+            reported.add(attendance_id)
+            results[index] = {"index": index, "status": "created" if new else "existing", "id": attendance_id}
+        response = Response({
+            "created": len(new_ids),
+            "results": results,
+        }, status=status.HTTP_200_OK)
+        return self.remember_idempotent(request, response)
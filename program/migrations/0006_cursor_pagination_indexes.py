@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('program', '0005_alter_programeventadmin_role'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='programsubscriber',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['program', '-subscribed_at', '-id'], name='subscriber_active_recent_idx'),
+        ),
+    ]
@@ -57,6 +57,16 @@ class ProgramSubscriber(models.Model):
     subscribed_at = models.DateTimeField(auto_now_add=True)
     unsubscribed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # A program's active subscribers, newest first (also the cursor pagination order).
+            models.Index(
+                fields=['program', '-subscribed_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='subscriber_active_recent_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"User: {self.subscriber.name} Subscribed to program {self.program.name} at {self.subscribed_at}"
 
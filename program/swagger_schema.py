@@ -478,7 +478,14 @@ my_subscribed_programs_schema = extend_schema(
 
 list_subscribers_in_program_schema = extend_schema(
     summary="List Subscribers of a Program",
-    description="Returns a paginated list of active subscribers for the specified program.",
+    description=(
+        "Returns a paginated list of active subscribers for the specified program, newest first. "
+        "Pass `paginate=cursor` for cursor pages (`next`/`previous` links, no `count`) that stay fast at any depth."
+    ),
+    parameters=[
+        OpenApiParameter('paginate', str, enum=['cursor'], description="`cursor` for cursor pagination."),
+        OpenApiParameter('cursor', str, description="Opaque position taken from a `next` or `previous` link."),
+    ],
     tags=["14. Subscribers in Program (by O. S. Admins, O. Admins, Event Admins & Event Organizers with permission)"],
     responses={
         200: OpenApiResponse(
@@ -47,6 +47,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from organization.models import Organization
+from event.pagination import OptionalCursorPagination
 from account.models import User
 from django.utils import timezone
 from .permissions import (
@@ -339,7 +340,9 @@ class NestedSubscribersViewset(ListModelMixin, GenericViewSet):
     queryset = ProgramSubscriber.objects.none()
     serializer_class = ProgramSubscriberGetSubsSerializer
     permission_classes = [NestedSubscribersViewsetPermissions]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = OptionalCursorPagination
+    # Matches subscriber_active_recent_idx, so every cursor page is one index range read.
+    cursor_ordering = ('-subscribed_at', '-id')
 
     @list_subscribers_in_program_schema
     def list(self, request, *args, **kwargs):
@@ -347,7 +350,7 @@ class NestedSubscribersViewset(ListModelMixin, GenericViewSet):
     
     def get_queryset(self):
         program_id = self.kwargs.get('program_pk')
-        return ProgramSubscriber.objects.filter(program__id=program_id, is_active=True).select_related('subscriber')
+        return ProgramSubscriber.objects.filter(program__id=program_id, is_active=True).select_related('subscriber').order_by('-subscribed_at', '-id')
 
 
 class NestedSubscribedProgramsViewset(ListModelMixin, GenericViewSet):